@@ -1,18 +1,18 @@
 from app_pages.multipage import MultiPage
-from app_pages.page_survival_predictor import page_predictor_body
-from app_pages.page_summary import page_summary_body
-from app_pages.page_hypothesis import page_project_hypothesis_body
-from app_pages.page_model_evaluation import page_evaluation_body
-from app_pages.page_factors_of_survival import page_factors_of_survival_body
-
 
 app = MultiPage(
     app_name="Factors for Survival: Class, Sex & Age on RMS Titanic")
 
-app.add_page("Project Summary", page_summary_body)
-app.add_page("Project Hypotheses", page_project_hypothesis_body)
-app.add_page("Factors for Survival Study", page_factors_of_survival_body)
-app.add_page("Predict Passenger Survival", page_predictor_body)
+# pages are imported on first selection, so a visitor who only reads the
+# summary never loads the plotting and modelling libraries
+app.add_page("Project Summary",
+             "app_pages.page_summary:page_summary_body")
+app.add_page("Project Hypotheses",
+             "app_pages.page_hypothesis:page_project_hypothesis_body")
+app.add_page("Factors for Survival Study",
+             "app_pages.page_factors_of_survival:page_factors_of_survival_body")
+app.add_page("Predict Passenger Survival",
+             "app_pages.page_survival_predictor:page_predictor_body")
 app.add_page("Predict Passenger Survival: Model Evaluation",
-             page_evaluation_body)
+             "app_pages.page_model_evaluation:page_evaluation_body")
 app.run()
@@ -1,6 +1,177 @@
+import cProfile
+import hmac
+import importlib
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+
+import pandas as pd
 import streamlit as st
 
 
+logger = logging.getLogger(__name__)
+
+# operators set PAGE_PROFILING=1 to time pages, or =cprofile to also trace
+PROFILING_ENV = "PAGE_PROFILING"
+# the panel is only shown to sessions opened with ?profile=<this secret>
+PROFILING_TOKEN_ENV = "PAGE_PROFILING_TOKEN"
+# process-wide caches whose counters are diffed around each page body; a
+# cache whose module has not been imported yet has nothing to count
+PROFILED_CACHES = {
+    "data": ("src.data_management", "data_cache"),
+    "model": ("src.model_registry", "registry"),
+    "figure": ("src.figure_cache", "figure_cache"),
+}
+TRACE_LINES = 25
+
+
+def profiling_mode():
+    mode = os.environ.get(PROFILING_ENV, "").strip().lower()
+    if mode in ["", "0", "false", "off"]:
+        return None
+    return "cprofile" if mode == "cprofile" else "timing"
+
+
+def is_operator():
+    token = os.environ.get(PROFILING_TOKEN_ENV, "")
+    if not token:
+        return False
+    # outside a Streamlit session there are no query params at all
+    params = st.experimental_get_query_params() or {}
+    given = params.get("profile", [""])[0]
+    return hmac.compare_digest(given.encode(), token.encode())
+
+
+def cache_counters():
+    counters = {}
+    for name, (module_name, attribute) in PROFILED_CACHES.items():
+        module = sys.modules.get(module_name)
+        if module is not None:
+            stats = getattr(module, attribute).stats()
+            counters[name] = (stats["hits"], stats["misses"])
+    return counters
+
+
+class PageProfiler:
+    """
+    Running totals of page render times across reruns and sessions, so
+    the most expensive pages show up under real traffic.
+    """
+
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def record(self, report):
+        with self._lock:
+            page = self._pages.setdefault(
+                report["page"], {"reruns": 0, "total_seconds": 0.0,
+                                 "max_seconds": 0.0})
+            page["reruns"] += 1
+            page["total_seconds"] += report["seconds"]
+            page["max_seconds"] = max(page["max_seconds"], report["seconds"])
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        with self._lock:
+            return {title: dict(page, mean_seconds=page["total_seconds"]
+                                / page["reruns"])
+                    for title, page in self._pages.items()}
+
+
+page_profiler = PageProfiler()
+
+
+def profile_page(title, func, trace=False):
+    """
+    Runs a page body and reports its wall time, the data and model loads
+    and cache hits it caused and the figures it drew or served from the
+    figure cache. The caches are process-wide, so under concurrent
+    sessions the counts include their activity too.
+    """
+    before = cache_counters()
+    profiler = cProfile.Profile() if trace else None
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        func()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        seconds = time.perf_counter() - start
+
+    after = cache_counters()
+    report = {"page": title, "seconds": seconds}
+    for name, (label_hits, label_misses) in [
+            ("data", ("data_hits", "data_loads")),
+            ("model", ("model_hits", "model_loads")),
+            ("figure", ("figures_cached", "figures_drawn"))]:
+        hits, misses = after.get(name, (0, 0))
+        hits_before, misses_before = before.get(name, (0, 0))
+        report[label_hits] = hits - hits_before
+        report[label_misses] = misses - misses_before
+
+    if profiler is not None:
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats(
+            "cumulative").print_stats(TRACE_LINES)
+        report["trace"] = buffer.getvalue()
+
+    page_profiler.record(report)
+    logger.info(
+        "page=%r seconds=%.3f data_loads=%d data_hits=%d model_loads=%d "
+        "model_hits=%d figures_drawn=%d figures_cached=%d", title, seconds,
+        report["data_loads"], report["data_hits"], report["model_loads"],
+        report["model_hits"], report["figures_drawn"],
+        report["figures_cached"])
+    return report
+
+
+def import_page(path):
+    """
+    Imports a page registered as "module:function" and returns its body.
+    Returns the seconds spent importing, or None when the module (and so
+    its heavy dependencies) had already been imported by an earlier rerun.
+    """
+    module_name, _, function_name = path.partition(":")
+    # a module is in sys.modules before it has finished running, so always
+    # go through import_module, which waits for another session's import
+    imported = module_name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    if imported:
+        return getattr(module, function_name), None
+
+    seconds = time.perf_counter() - start
+    logger.info("Imported page module %s in %.3f seconds", module_name,
+                seconds)
+    return getattr(module, function_name), seconds
+
+
+def show_profiling_panel(report):
+    with st.sidebar.beta_expander("Profiling", expanded=False):
+        st.write(f"**{report['page']}** rendered in "
+                 f"{1000 * report['seconds']:.1f} ms")
+        st.write({key: value for key, value in report.items()
+                  if key not in ["page", "seconds", "trace"]})
+        st.write("Page render times in this process (seconds)")
+        st.table(pd.DataFrame.from_dict(page_profiler.stats(),
+                                        orient="index"))
+        if report.get("import_seconds") is not None:
+            st.write(f"Page module imported in "
+                     f"{1000 * report['import_seconds']:.1f} ms")
+        if "trace" in report:
+            st.text(report["trace"])
+
+
 class MultiPage:
 
     def __init__(self, app_name) -> None:
@@ -11,10 +182,34 @@ class MultiPage:
             page_title=self.app_name)
 
     def add_page(self, title, func) -> None:
+        """
+        func is either the page body or its import path, "module:function";
+        a page given by path is only imported when it is first selected.
+        """
         self.pages.append({"title": title, "function": func})
 
     def run(self):
         st.title(self.app_name)
         page = st.sidebar.radio(
             'Menu', self.pages, format_func=lambda page: page['title'])
-        page['function']()
+
+        mode = profiling_mode()
+        if mode is not None:
+            logging.basicConfig(level=logging.INFO,
+                                format="%(asctime)s %(levelname)s %(message)s")
+
+        func, import_seconds = page['function'], None
+        if isinstance(func, str):
+            func, import_seconds = import_page(func)
+
+        if mode is None:
+            func()
+            return
+        # every rerun is timed and logged; only operators see the panel and
+        # pay for a trace
+        operator = is_operator()
+        report = profile_page(page['title'], func,
+                              trace=operator and mode == "cprofile")
+        report["import_seconds"] = import_seconds
+        if operator:
+            show_profiling_panel(report)
@@ -3,18 +3,17 @@ import matplotlib.pyplot as plt
 import plotly.express as px
 import seaborn as sns
 import pandas as pd
-from src.data_management import load_passenger_data
-from scipy.stats import chi2_contingency
-from feature_engine.discretisation import EqualFrequencyDiscretiser
-
-
-sns.set_style('whitegrid')
+from src.data_management import load_passenger_data, dataset_fingerprint
+from src.figure_cache import render_figure
+from src.binning import assign_bins, cached_quantile_edges
+from src.survival_statistics import contingency_analysis
 
 
 def page_factors_of_survival_body():
     st.header("Factors for Survival Study")
 
-    df = load_passenger_data()
+    df = load_passenger_data(compact=True)
+    fingerprint = dataset_fingerprint(df)
 
     st.info(
         "Southampton City Council (SCC) wish to learn more about "
@@ -25,11 +24,12 @@ def page_factors_of_survival_body():
     )
 
     if st.checkbox("Inspect Passenger Data"):
+        df_raw = load_passenger_data()
         st.write(
-            f"The dataset has {df.shape[0]} rows and {df.shape[1]} columns.\n\n"
+            f"The dataset has {df_raw.shape[0]} rows and {df_raw.shape[1]} columns.\n\n"
             f"The first 10, used to indicate the format of the data, are below.")
 
-        st.write(df.head(10))
+        st.write(df_raw.head(10))
 
     st.write("---")
 
@@ -49,10 +49,10 @@ def page_factors_of_survival_body():
     df_eda = df.filter(vars_to_study + ['Survived'])
     df_eda['Pclass'] = df_eda['Pclass'].map(
         {1: '1st Class', 2: '2nd Class', 3: '3rd Class'})
-    df_parallel = prepare_parallel_plot(df_eda)
+    df_parallel = prepare_parallel_plot(df_eda, fingerprint)
 
     if st.checkbox("View Survival Levels per Variable"):
-        survival_level_per_variable(df_eda, vars_to_study)
+        survival_level_per_variable(df_eda, vars_to_study, fingerprint)
         st.info(
             "The following observations are clear from the plots: \n\n"
             "* Male passengers appear to be less likely to survive than female passengers. \n"
@@ -101,48 +101,70 @@ def page_factors_of_survival_body():
     # Utility Functions
 
 
-def plot_categorical(df, col, target_var):
-    plt.figure(figsize=(12, 5))
-    sns.countplot(data=df, x=col, hue=target_var,
-                  order=df[col].value_counts().index)
-    plt.xticks(rotation=45)
-    plt.title(f"{col}", fontsize=20, y=1.05)
-    st.pyplot(plt)
+SURVIVAL_LABELS = {0: 'Did Not Survive', 1: 'Survived'}
+
+
+def label_table(table, column_labels):
+    return (table.rename(index=SURVIVAL_LABELS, columns=column_labels)
+            .rename_axis(index=None, columns=None))
+
+
+# Streamlit downsizes wider images on every call, so cache them at this width
+MAX_IMAGE_WIDTH = 2 * 730
+
+
+def show_figure(key, draw):
+    def styled_draw():
+        # styled per figure rather than globally when the page is imported
+        with sns.axes_style('whitegrid'):
+            return draw()
 
+    st.image(render_figure(key, styled_draw, max_width=MAX_IMAGE_WIDTH),
+             use_column_width=True)
 
-def plot_numerical(df, col, target_var):
-    plt.figure(figsize=(8, 5))
-    sns.histplot(data=df, x=col, hue=target_var, kde=True, element="step")
-    plt.title(f"{col}", fontsize=20, y=1.05)
-    st.pyplot(plt)
 
+def plot_categorical(df, col, target_var, fingerprint=None):
+    def draw():
+        fig, ax = plt.subplots(figsize=(12, 5))
+        sns.countplot(data=df, x=col, hue=target_var,
+                      order=df[col].value_counts().index, ax=ax)
+        ax.tick_params(axis='x', labelrotation=45)
+        ax.set_title(f"{col}", fontsize=20, y=1.05)
+        return fig
 
-def survival_level_per_variable(df_eda, vars_to_study):
+    key = (fingerprint or dataset_fingerprint(df), 'categorical', col, target_var)
+    show_figure(key, draw)
+
+
+def plot_numerical(df, col, target_var, fingerprint=None):
+    def draw():
+        fig, ax = plt.subplots(figsize=(8, 5))
+        sns.histplot(data=df, x=col, hue=target_var, kde=True, element="step",
+                     ax=ax)
+        ax.set_title(f"{col}", fontsize=20, y=1.05)
+        return fig
+
+    key = (fingerprint or dataset_fingerprint(df), 'numerical', col, target_var)
+    show_figure(key, draw)
+
+
+def survival_level_per_variable(df_eda, vars_to_study, fingerprint=None):
     target_var = 'Survived'
     for col in vars_to_study:
-        if df_eda[col].dtype == 'object':
-            plot_categorical(df_eda, col, target_var)
-            print("\n\n")
+        if not pd.api.types.is_numeric_dtype(df_eda[col]):
+            plot_categorical(df_eda, col, target_var, fingerprint)
         else:
-            plot_numerical(df_eda, col, target_var)
-            print("\n\n")
+            plot_numerical(df_eda, col, target_var, fingerprint)
 
 
-def prepare_parallel_plot(df_eda):
+def prepare_parallel_plot(df_eda, fingerprint=None):
     n_classes = 10
-    disc = EqualFrequencyDiscretiser(q=n_classes, variables=['Fare'])
-    df_parallel = disc.fit_transform(df_eda)
-    classes_ranges = disc.binner_dict_['Fare'][1:-1]
-    fare_map = {}
-    for n in range(0, n_classes):
-        if n == 0:
-            fare_map[n] = f"<{round(classes_ranges[0],2)}"
-        elif n == n_classes-1:
-            fare_map[n] = f"+{round(classes_ranges[-1],2)}"
-        else:
-            fare_map[n] = f"{round(classes_ranges[n-1],2)} to {round(classes_ranges[n],2)}"
+    edges = cached_quantile_edges(
+        df_eda['Fare'], n_classes,
+        key=(fingerprint or dataset_fingerprint(df_eda), 'Fare'))
 
-    df_parallel['Fare'] = df_parallel['Fare'].replace(fare_map)
+    df_parallel = df_eda.copy()
+    df_parallel['Fare'] = assign_bins(df_parallel['Fare'], edges)
     return df_parallel
 
 
@@ -152,12 +174,10 @@ def show_parallel_plot(df_parallel):
 
 
 def plot_expected_survival_by_sex(df):
-    contingency_table = pd.crosstab(df['Survived'], df['Sex'])
-    chi2, p_value, dof, expected = chi2_contingency(contingency_table)
-    contingency_table.index = ['Did Not Survive', 'Survived']
-    contingency_table.columns = ['Female', 'Male']
-    expected_df = pd.DataFrame(
-        expected, index=['Did Not Survive', 'Survived'], columns=['Female', 'Male'])
+    analysis = contingency_analysis(df, ['Sex'])
+    labels = {'female': 'Female', 'male': 'Male'}
+    contingency_table = label_table(analysis['observed'], labels)
+    expected_df = label_table(analysis['expected'], labels)
     st.write(
         "Below is the expected survival rate by sex, if sex had no relationship to survival.")
     st.table(expected_df.round().astype(int))
@@ -168,26 +188,25 @@ def plot_expected_survival_by_sex(df):
         "It looks like male passengers were disproportionately less likely to survive "
         "compared to female passengers.")
 
-    fig, ax = plt.subplots(1, 2, figsize=(10, 5))
+    def draw():
+        fig, ax = plt.subplots(1, 2, figsize=(10, 5))
+        for i, sex in enumerate(contingency_table.columns):
+            ax[i].pie(contingency_table[sex], labels=contingency_table.index,
+                      autopct='%1.1f%%', startangle=90)
+            ax[i].set_title(f'Survival Status - {sex}')
+        return fig
 
-    for i, sex in enumerate(contingency_table.columns):
-        ax[i].pie(contingency_table[sex], labels=contingency_table.index,
-                  autopct='%1.1f%%', startangle=90)
-        ax[i].set_title(f'Survival Status - {sex}')
-
-    st.pyplot(fig)
+    show_figure((dataset_fingerprint(df), 'survival_pies', 'Sex'), draw)
     st.info(
         "The pie charts again above highlight the disparity in outcomes between the male and female passengers."
     )
 
 
 def plot_expected_survival_by_class(df):
-    contingency_table = pd.crosstab(df['Survived'], df['Pclass'])
-    chi2, p_value, dof, expected = chi2_contingency(contingency_table)
-    contingency_table.index = ['Did Not Survive', 'Survived']
-    contingency_table.columns = ['First Class', 'Second Class', "Third Class"]
-    expected_df = pd.DataFrame(
-        expected, index=['Did Not Survive', 'Survived'], columns=['First Class', 'Second Class', "Third Class"])
+    analysis = contingency_analysis(df, ['Pclass'])
+    labels = {1: 'First Class', 2: 'Second Class', 3: 'Third Class'}
+    contingency_table = label_table(analysis['observed'], labels)
+    expected_df = label_table(analysis['expected'], labels)
     st.write(
         "Below is the expected survival rate by class, if class had no relationship to survival.")
     st.table(expected_df.round().astype(int))
@@ -198,14 +217,15 @@ def plot_expected_survival_by_class(df):
         "It looks like First Class passengers were disproportionately more likely to survive "
         "compared to Third Class passengers.")
 
-    fig, ax = plt.subplots(1, 3, figsize=(10, 5))
-
-    for i, pclass in enumerate(contingency_table.columns):
-        ax[i].pie(contingency_table[pclass], labels=contingency_table.index,
-                  autopct='%1.1f%%', startangle=90)
-        ax[i].set_title(f'Survival Status By Class - {pclass}')
+    def draw():
+        fig, ax = plt.subplots(1, 3, figsize=(10, 5))
+        for i, pclass in enumerate(contingency_table.columns):
+            ax[i].pie(contingency_table[pclass], labels=contingency_table.index,
+                      autopct='%1.1f%%', startangle=90)
+            ax[i].set_title(f'Survival Status By Class - {pclass}')
+        return fig
 
-    st.pyplot(fig)
+    show_figure((dataset_fingerprint(df), 'survival_pies', 'Pclass'), draw)
     st.info(
         "The pie charts again above highlight the disparity in outcomes between passengers across the class categories."
     )
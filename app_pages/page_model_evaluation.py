@@ -1,28 +1,13 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-from src.data_management import load_pkl_file
-from src.machine_learning.evaluate_clf import clf_performance
+from src.machine_learning.evaluate_clf import load_evaluation, show_clf_performance
 
 
 def page_evaluation_body():
 
     version = 'v6'
 
-    pipeline_dc_fe = load_pkl_file(
-        f"outputs/ml_pipeline/predict-survivor/{version}/pipeline_dc_fe.pkl")
-    pipeline_model = load_pkl_file(
-        f"outputs/ml_pipeline/predict-survivor/{version}/pipeline_clf.pkl")
-    survival_feat_importance = plt.imread(
-        f"outputs/ml_pipeline/predict-survivor/{version}/features_importance.png")
-    X_train = pd.read_csv(
-        f"outputs/ml_pipeline/predict-survivor/{version}/X_train.csv")
-    X_test = pd.read_csv(
-        f"outputs/ml_pipeline/predict-survivor/{version}/X_test.csv")
-    y_train = pd.read_csv(
-        f"outputs/ml_pipeline/predict-survivor/{version}/y_train.csv").values
-    y_test = pd.read_csv(
-        f"outputs/ml_pipeline/predict-survivor/{version}/y_test.csv").values
+    evaluation = load_evaluation(
+        version, label_map=["Did Not Survive", "Survived"])
 
     st.header("ML Pipeline: Predict Passenger Survival")
 
@@ -38,22 +23,19 @@ def page_evaluation_body():
     st.write("#### There are actually 2 ML Pipelines used in this process.")
 
     st.write(" * The first is responsible for data cleaning and feature engineering.")
-    st.code(pipeline_dc_fe, language='python')
+    st.code(evaluation["pipeline_dc_fe"], language='python')
 
     st.write("* The second is for feature scaling and modelling.")
-    st.code(pipeline_model, language='python')
+    st.code(evaluation["pipeline_clf"], language='python')
 
     st.write("---")
     st.write("* The features the model was trained and their importance.")
-    st.write(X_train.columns.to_list())
-    st.image(survival_feat_importance)
+    st.write(evaluation["features"])
+    st.image(evaluation["features_importance"])
 
     st.write("---")
     st.write("### Pipeline Performance")
-    clf_performance(X_train=X_train, y_train=y_train,
-                    X_test=X_test, y_test=y_test,
-                    pipeline=pipeline_model,
-                    label_map=["Did Not Survive", "Survived"])
+    show_clf_performance(evaluation)
 
     st.write('---')
 
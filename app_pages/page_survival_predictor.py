@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
-from src.data_management import load_passenger_data, load_pkl_file
+from src.data_management import load_passenger_stats
+from src.model_registry import load_pipelines
 from src.machine_learning.predictive_analysis_ui import predict_survival
+from src.machine_learning.prediction_grid import load_prediction_grid
 
 
 def page_predictor_body():
@@ -17,16 +19,14 @@ def page_predictor_body():
     )
 
     version = 'v6'
-    pipeline_dc_fe = load_pkl_file(
-        f"outputs/ml_pipeline/predict-survivor/{version}/pipeline_dc_fe.pkl")
-    pipeline_model = load_pkl_file(
-        f"outputs/ml_pipeline/predict-survivor/{version}/pipeline_clf.pkl")
+    pipeline_dc_fe, pipeline_model = load_pipelines(version)
+    prediction_grid = load_prediction_grid(version)
 
     X_live = DrawInputsWidgets()
 
     if st.button("Predict Survival"):
         survivor_prediction = predict_survival(
-            X_live, pipeline_dc_fe, pipeline_model)
+            X_live, pipeline_dc_fe, pipeline_model, prediction_grid)
 
     st.write('---')
 
@@ -39,11 +39,7 @@ def page_predictor_body():
 
 def DrawInputsWidgets():
     X_live = pd.DataFrame([], index=[0])
-    df = load_passenger_data()
-
-    if 'filtered_df' not in st.session_state:
-        # st.session_state['Pclass'] = 1
-        st.session_state['filtered_df'] = df[df["Pclass"] == 1]
+    stats = load_passenger_stats()
 
     col1, col2 = st.beta_columns(2)
     col3, col4 = st.beta_columns(2)
@@ -52,7 +48,7 @@ def DrawInputsWidgets():
         feature = "Sex"
         st_widget = st.selectbox(
             label=feature,
-            options=df[feature].unique(),
+            options=stats[feature],
         )
         X_live[feature] = st_widget
 
@@ -61,29 +57,29 @@ def DrawInputsWidgets():
         st_widget = st.slider(
             label=feature,
             min_value=0,
-            max_value=int(df[feature].max()),
+            max_value=stats[feature]["max"],
             step=1,
-            value=int(df[feature].median()),
+            value=stats[feature]["median"],
         )
         X_live[feature] = st_widget
 
     with col1:
         feature = "Pclass"
         st_widget = st.selectbox(
-            on_change=change(df, st_widget),
             label=feature,
-            options=sorted(df[feature].unique())
+            options=stats[feature]
         )
-        st.session_state['filtered_df'] = df[df["Pclass"] == st_widget]
         X_live[feature] = st_widget
+        pclass = st_widget
 
     with col4:
         feature = "Fare"
+        fare_stats = stats[feature][pclass]
         st_widget = st.slider(
             label=feature,
-            min_value=float(st.session_state['filtered_df'][feature].min()),
-            max_value=float(st.session_state['filtered_df'][feature].max()),
-            value=float(st.session_state['filtered_df'][feature].median()),
+            min_value=fare_stats["min"],
+            max_value=fare_stats["max"],
+            value=fare_stats["median"],
             step=1.0,
         )
         st.write(
@@ -91,9 +87,6 @@ def DrawInputsWidgets():
             f"* Most Second Class tickets cost between £13 and £26, with a median of £14\n\n"
             f"* Most First Class tickets were cost between £30 and £94, with a median of £60\n\n"
         )
-        X_live[feature] = st_widget  
+        X_live[feature] = st_widget
 
     return X_live
-
-def change(df, st_widget):
-    st.session_state['filtered_df'] = df[df["Pclass"] == st_widget]
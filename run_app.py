@@ -0,0 +1,35 @@
+import logging
+import sys
+
+from src.warmup import warm_up
+
+
+logger = logging.getLogger(__name__)
+
+APP_SCRIPT = "app.py"
+
+
+def main(argv=None):
+    """
+    Warms the caches in this process and only then starts the Streamlit
+    server, so the port is bound by a process that is already warm. A
+    failed warm-up is logged and the app starts cold rather than not at all.
+    """
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    warm_up.run()
+    if not warm_up.ready():
+        logger.warning("Starting %s without a complete warm-up", APP_SCRIPT)
+
+    import streamlit
+    from streamlit import bootstrap
+
+    # what `streamlit run` sets up before handing over to the bootstrap
+    streamlit._is_running_with_streamlit = True
+    bootstrap.load_config_options(flag_options={})
+    bootstrap.run(APP_SCRIPT, f"streamlit run {APP_SCRIPT}",
+                  list(sys.argv[1:] if argv is None else argv), {})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data_management import load_pkl_file
+from src.model_registry import ModelRegistry, load_pipelines, pipeline_path
+
+
+RAW_DATA_PATH = "inputs/datasets/raw/Titanic-Dataset.csv"
+BENCHMARK_DIR = "outputs/benchmarks"
+BASELINE_FILE = "baseline.json"
+BATCH_SIZES = [1, 100, 10_000, 1_000_000]
+ANALYTICS_ROWS = 100_000
+# a benchmark regresses when its median is this much slower than baseline
+DEFAULT_TOLERANCE = 0.25
+LABEL_MAP = ['Did Not Survive', 'Survived']
+
+
+def synthetic_passengers(n_rows, seed=0):
+    """
+    n_rows passengers resampled from the raw Kaggle dataset, with a little
+    noise on Age and Fare so the rows are not exact copies. Missing values
+    are kept at their original rate.
+    """
+    rng = np.random.default_rng(seed)
+    raw = pd.read_csv(RAW_DATA_PATH)
+    df = raw.iloc[rng.integers(0, len(raw), n_rows)].reset_index(drop=True)
+    df["PassengerId"] = np.arange(1, n_rows + 1)
+    df["Age"] = (df["Age"] + rng.normal(0, 1, n_rows)).clip(lower=0.42)
+    df["Fare"] = (df["Fare"] * rng.uniform(0.95, 1.05, n_rows)).round(4)
+    return df
+
+
+def measure(fn, repeat=5, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "repeat": repeat,
+        "min_seconds": timings[0],
+        "median_seconds": statistics.median(timings),
+        "mean_seconds": statistics.mean(timings),
+        "p95_seconds": timings[min(len(timings) - 1,
+                                   int(round(0.95 * (len(timings) - 1))))],
+    }
+
+
+def bench_loading(version, repeat):
+    file_path = pipeline_path(version, "pipeline_clf.pkl")
+    registry = ModelRegistry()
+    registry.load(file_path)
+    return {
+        "load_pkl_file.cold": measure(lambda: load_pkl_file(file_path),
+                                      repeat),
+        "registry_load.warm": measure(lambda: registry.load(file_path),
+                                      repeat * 20),
+    }
+
+
+def bench_single_prediction(version, repeat):
+    from src.machine_learning.predictive_analysis_ui import predict_survival
+    from src.machine_learning.prediction_grid import load_prediction_grid
+
+    pipeline_dc_fe, pipeline_model = load_pipelines(version)
+    prediction_grid = load_prediction_grid(version)
+    X_live = pd.DataFrame(
+        [{"Sex": "female", "Age": 28.0, "Pclass": 2, "Fare": 14.0}])
+
+    results = {"predict_survival.pipelines": measure(
+        lambda: predict_survival(X_live, pipeline_dc_fe, pipeline_model),
+        repeat * 20)}
+    if prediction_grid is not None:
+        results["predict_survival.grid"] = measure(
+            lambda: predict_survival(X_live, pipeline_dc_fe, pipeline_model,
+                                     prediction_grid), repeat * 20)
+    return results
+
+
+def bench_batch(version, sizes, repeat):
+    from src.machine_learning.batch_prediction import predict_survival_batch
+    from src.machine_learning.fast_scorer import load_fast_scorer
+
+    pipeline_dc_fe, pipeline_model = load_pipelines(version)
+    try:
+        fast_scorer = load_fast_scorer(version)
+    except (FileNotFoundError, ValueError):
+        fast_scorer = None
+
+    results = {}
+    for size in sizes:
+        X = synthetic_passengers(size)
+        # keep the total work per size roughly constant
+        size_repeat = max(1, min(repeat * 4, 1_000_000 // max(size, 1) // 10))
+        scorers = [("predict_survival_batch", lambda: predict_survival_batch(
+            X, pipeline_dc_fe, pipeline_model))]
+        if fast_scorer is not None:
+            scorers.append(("fast_scorer", lambda: fast_scorer.predict(X)))
+        for name, score in scorers:
+            result = measure(score, size_repeat)
+            result["rows"] = size
+            result["rows_per_second"] = size / result["median_seconds"]
+            results[f"{name}.{size}"] = result
+    return results
+
+
+def bench_evaluation(version, repeat):
+    from src.data_management import load_pipeline_split
+    from src.machine_learning.evaluate_clf import clf_performance
+
+    _, pipeline_model = load_pipelines(version)
+    X_train = load_pipeline_split(version, "X_train")
+    X_test = load_pipeline_split(version, "X_test")
+    y_train = load_pipeline_split(version, "y_train").values
+    y_test = load_pipeline_split(version, "y_test").values
+    return {"clf_performance": measure(
+        lambda: clf_performance(X_train, y_train, X_test, y_test,
+                                pipeline_model, LABEL_MAP), repeat)}
+
+
+def bench_analytics(n_rows, repeat):
+    from src import binning, survival_statistics
+    from src.data_management import compact_passenger_frame
+    from app_pages.page_factors_of_survival import prepare_parallel_plot
+
+    df = compact_passenger_frame(synthetic_passengers(n_rows))
+    df_eda = df.filter(['Sex', 'Pclass', 'Age', 'Fare', 'Survived'])
+
+    def clear_caches():
+        binning._edges_cache.clear()
+        survival_statistics._analysis_cache.clear()
+
+    def chi_square():
+        for factors in [['Sex'], ['Pclass']]:
+            survival_statistics.contingency_analysis(df, factors)
+
+    results = {
+        "prepare_parallel_plot.cold": measure(
+            lambda: prepare_parallel_plot(df_eda), repeat,
+            setup=clear_caches),
+        "prepare_parallel_plot.warm": measure(
+            lambda: prepare_parallel_plot(df_eda), repeat),
+        "contingency_analysis.cold": measure(chi_square, repeat,
+                                             setup=clear_caches),
+        "contingency_analysis.warm": measure(chi_square, repeat * 20),
+    }
+    for result in results.values():
+        result["rows"] = n_rows
+    return results
+
+
+BENCHMARKS = ["loading", "single", "batch", "evaluation", "analytics"]
+
+
+def run_benchmarks(version="v6", only=None, sizes=BATCH_SIZES,
+                   analytics_rows=ANALYTICS_ROWS, repeat=5):
+    only = only or BENCHMARKS
+    results = {}
+    if "loading" in only:
+        results.update(bench_loading(version, repeat))
+    if "single" in only:
+        results.update(bench_single_prediction(version, repeat))
+    if "batch" in only:
+        results.update(bench_batch(version, sizes, repeat))
+    if "evaluation" in only:
+        results.update(bench_evaluation(version, repeat))
+    if "analytics" in only:
+        results.update(bench_analytics(analytics_rows, repeat))
+
+    return {
+        "meta": {
+            "version": version,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Median timings against a baseline report, one row per benchmark both
+    reports ran. A row regresses when it is more than tolerance slower.
+    """
+    rows = []
+    for name, result in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        ratio = result["median_seconds"] / base["median_seconds"]
+        rows.append({"benchmark": name,
+                     "baseline_seconds": base["median_seconds"],
+                     "median_seconds": result["median_seconds"],
+                     "ratio": ratio,
+                     "regression": ratio > 1 + tolerance})
+    return pd.DataFrame(rows, columns=["benchmark", "baseline_seconds",
+                                       "median_seconds", "ratio",
+                                       "regression"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time the prediction, evaluation and analytics paths and "
+                    "compare them against a stored baseline.")
+    parser.add_argument("--version", default="v6")
+    parser.add_argument("--only", nargs="*", choices=BENCHMARKS)
+    parser.add_argument("--sizes", nargs="*", type=int, default=BATCH_SIZES,
+                        help="batch sizes to score")
+    parser.add_argument("--analytics-rows", type=int, default=ANALYTICS_ROWS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="where to write the JSON report "
+                                         f"(default {BENCHMARK_DIR}/"
+                                         "<version>.json)")
+    parser.add_argument("--baseline",
+                        default=os.path.join(BENCHMARK_DIR, BASELINE_FILE))
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.version, args.only, args.sizes,
+                            args.analytics_rows, args.repeat)
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    output = args.output or os.path.join(BENCHMARK_DIR,
+                                         f"{args.version}.json")
+    for path in [output] + ([args.baseline] if args.save_baseline else []):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"* Benchmark report written to {path}")
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        for name, result in report["results"].items():
+            print(f"{name:45} {1000 * result['median_seconds']:12.3f} ms")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    comparison = compare(report, baseline, args.tolerance)
+    print(comparison.to_string(index=False))
+    regressions = comparison[comparison["regression"]]
+    if len(regressions):
+        print(f"* {len(regressions)} benchmarks regressed by more than "
+              f"{args.tolerance:.0%} against {args.baseline}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
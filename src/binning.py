@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def quantile_edges(values, q):
+    # same edges as feature-engine's EqualFrequencyDiscretiser: quantiles with
+    # duplicates dropped and open-ended outer bins
+    _, edges = pd.qcut(values, q=q, retbins=True, duplicates="drop")
+    edges = np.asarray(edges, dtype=float)
+    edges[0], edges[-1] = -np.inf, np.inf
+    return edges
+
+
+def bin_labels(edges):
+    # edges at 2dp, with more decimals only when that is needed to tell
+    # distinct edges apart, so every label is unique
+    inner = [float(edge) for edge in edges[1:-1]]
+    if not inner:
+        return ["All"]
+    for digits in range(2, 17):
+        rounded = [round(edge, digits) for edge in inner]
+        if len(set(rounded)) == len(rounded):
+            inner = rounded
+            break
+    labels = [f"<{inner[0]}"]
+    labels += [f"{low} to {high}" for low, high in zip(inner[:-1], inner[1:])]
+    labels.append(f"+{inner[-1]}")
+    return labels
+
+
+def assign_bins(values, edges, labels=None):
+    # right-closed bins, as pd.cut, in a single searchsorted call
+    values = np.asarray(values, dtype=float)
+    codes = np.searchsorted(edges[1:-1], values, side="left")
+    codes[np.isnan(values)] = -1
+    return pd.Categorical.from_codes(
+        codes, categories=labels or bin_labels(edges), ordered=True)
+
+
+_edges_cache = OrderedDict()
+_edges_lock = threading.Lock()
+MAX_CACHED_EDGES = 32
+
+
+def cached_quantile_edges(values, q, key):
+    """
+    quantile_edges, computed once per key; key should identify the data,
+    e.g. (dataset fingerprint, column name).
+    """
+    key = (key, q)
+    with _edges_lock:
+        if key in _edges_cache:
+            _edges_cache.move_to_end(key)
+            return _edges_cache[key]
+
+    edges = quantile_edges(values, q)
+
+    with _edges_lock:
+        _edges_cache[key] = edges
+        while len(_edges_cache) > MAX_CACHED_EDGES:
+            _edges_cache.popitem(last=False)
+    return edges
@@ -1,15 +1,287 @@
-import streamlit as st
+import copy
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+import weakref
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 import joblib
 from os.path import join
+from src.model_registry import pipeline_path
+from src.storage import dataset_file, read_dataset, read_matrix
 
 
-@st.cache(suppress_st_warning=True, allow_output_mutation=True)
-def load_passenger_data():
-    df = pd.read_csv("outputs/datasets/collection/titanic_passengers.csv")
-    return df
+logger = logging.getLogger(__name__)
+
+PASSENGER_DATA_PATH = "outputs/datasets/collection/titanic_passengers.csv"
+
+PASSENGER_SCHEMA = {
+    "PassengerId": "int64", "Survived": "int64", "Pclass": "int64",
+    "Name": "object", "Sex": "object", "Age": "float64", "SibSp": "int64",
+    "Parch": "int64", "Ticket": "object", "Fare": "float64",
+    "Cabin": "object", "Embarked": "object",
+}
+CLEANED_SCHEMA = {
+    col: dtype for col, dtype in PASSENGER_SCHEMA.items()
+    if col not in ["PassengerId", "Name", "Ticket", "Cabin"]}
+TARGET_SCHEMA = {"Survived": "int64"}
+
+# the columns the dashboard pages actually use, at the smallest safe dtypes
+COMPACT_PASSENGER_SCHEMA = {
+    "Survived": "int8", "Pclass": "int8", "Sex": "category",
+    "Age": "float32", "Fare": "float32",
+}
+
+# keyed by CSV file name; feature splits are typed by their columnar copy
+DATASET_SCHEMAS = {
+    "titanic_passengers.csv": PASSENGER_SCHEMA,
+    "TrainSetCleaned.csv": CLEANED_SCHEMA,
+    "TestSetCleaned.csv": CLEANED_SCHEMA,
+    "y_train.csv": TARGET_SCHEMA,
+    "y_test.csv": TARGET_SCHEMA,
+}
+
+
+def compact_passenger_frame(df):
+    columns = [col for col in COMPACT_PASSENGER_SCHEMA if col in df.columns]
+    return df[columns].astype(
+        {col: COMPACT_PASSENGER_SCHEMA[col] for col in columns})
+
+
+def memory_report(before, after):
+    before_bytes = int(before.memory_usage(deep=True).sum())
+    after_bytes = int(after.memory_usage(deep=True).sum())
+    return {
+        "before_bytes": before_bytes,
+        "after_bytes": after_bytes,
+        "saved_fraction": 1 - after_bytes / before_bytes if before_bytes else 0.0,
+    }
+
+
+class DataCache:
+    """
+    Process-wide cache for loaded datasets, shared by every session.
+
+    Entries are keyed by name and validated against a version (e.g. source
+    path, mtime and size), so a changed file replaces its stale entry. The
+    cache is bounded by entry count, total bytes and age, evicting least
+    recently used entries first. Frames are frozen on insert and handed out
+    as shallow copies: replacing a column only affects the caller's copy,
+    and writing into the shared arrays raises. Other values are deep-copied.
+    """
+
+    def __init__(self, max_entries=32, max_bytes=256 * 2**20, ttl=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0,
+                          "expirations": 0, "invalidations": 0}
+
+    def get(self, name, version, loader):
+        value = self._lookup(name, version)
+        if value is not None:
+            return view(value)
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            # another session may have loaded it while we waited
+            value = self._lookup(name, version, count=False)
+            if value is None:
+                value = loader()
+                self._insert(name, version, value)
+        return view(value)
+
+    def _lookup(self, name, version, count=True):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                pass
+            elif entry["version"] != version:
+                del self._entries[name]
+                self._counters["invalidations"] += 1
+                entry = None
+            elif self.ttl is not None \
+                    and time.monotonic() - entry["loaded_at"] > self.ttl:
+                del self._entries[name]
+                self._counters["expirations"] += 1
+                entry = None
+
+            if count:
+                self._counters["hits" if entry else "misses"] += 1
+            if entry is None:
+                return None
+            self._entries.move_to_end(name)
+            return entry["value"]
+
+    def _insert(self, name, version, value):
+        size = value_size(value)
+        if size > self.max_bytes:
+            logger.warning("Not caching %s: %d bytes exceeds the cache limit",
+                           name, size)
+            return
+        if isinstance(value, pd.DataFrame):
+            freeze(value)
+            dataset_fingerprint(value)
+
+        with self._lock:
+            self._entries[name] = {"version": version, "value": value,
+                                   "bytes": size,
+                                   "loaded_at": time.monotonic()}
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries \
+                    or self.total_bytes() > self.max_bytes:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def total_bytes(self):
+        return sum(entry["bytes"] for entry in self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries),
+                        bytes=self.total_bytes())
+
+
+def value_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def backing_array(values):
+    # categoricals keep their codes in a plain ndarray
+    return getattr(values, "_ndarray", values)
+
+
+def is_frozen(df):
+    return all(isinstance(backing_array(values), np.ndarray)
+               and not backing_array(values).flags.writeable
+               for values in df._mgr.arrays)
+
+
+def freeze(df):
+    for values in df._mgr.arrays:
+        values = backing_array(values)
+        if isinstance(values, np.ndarray):
+            values.flags.writeable = False
+
+
+def view(value):
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    return copy.deepcopy(value)
+
+
+def file_version(file_path):
+    stat = os.stat(file_path)
+    return (file_path, stat.st_mtime_ns, stat.st_size)
+
+
+data_cache = DataCache()
+
+
+def load_passenger_data(compact=False):
+    source = dataset_file(PASSENGER_DATA_PATH)
+    return data_cache.get(
+        ("passenger_data", compact), file_version(source),
+        lambda: read_passenger_data(compact))
+
+
+def read_passenger_data(compact=False):
+    if not compact:
+        return read_dataset(PASSENGER_DATA_PATH, schema=PASSENGER_SCHEMA)
+
+    df = read_dataset(PASSENGER_DATA_PATH, schema=PASSENGER_SCHEMA,
+                      columns=list(COMPACT_PASSENGER_SCHEMA))
+    compact_df = compact_passenger_frame(df)
+    report = memory_report(df, compact_df)
+    logger.info("Compact passenger data: %d -> %d bytes (%.0f%% saved)",
+                report["before_bytes"], report["after_bytes"],
+                100 * report["saved_fraction"])
+    return compact_df
+
+
+def load_pipeline_split(version, name, columns=None, mmap=False):
+    # name is one of X_train, X_test, y_train, y_test; with mmap, a .npy
+    # copy is memory-mapped read-only instead of parsed into a new frame
+    file_name = f"{name}.csv"
+    if mmap:
+        df = read_matrix(pipeline_path(version, file_name))
+        if df is not None:
+            return df if columns is None else df[columns]
+    return read_dataset(pipeline_path(version, file_name),
+                        schema=DATASET_SCHEMAS.get(file_name), columns=columns)
 
 
 def load_pkl_file(file_path):
     return joblib.load(filename=file_path)
+
+
+_fingerprints = {}
+
+
+def dataset_fingerprint(df):
+    # content hash of a frame; only frozen frames, whose arrays cannot be
+    # written in place, have it memoised on the identity of their index,
+    # column labels and column arrays for as long as they live. Views of a
+    # cached frame share its arrays and so its hash, while any frame that
+    # could have been edited in place is hashed afresh on every call
+    frozen = is_frozen(df)
+    owners = [df.index] + list(df._mgr.arrays)
+    key = (tuple(df.columns), tuple(id(owner) for owner in owners))
+    if frozen:
+        cached = _fingerprints.get(key)
+        if cached is not None:
+            return cached
+
+    digest = hashlib.sha1()
+    digest.update(repr(list(zip(df.columns, df.dtypes.astype(str)))).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    fingerprint = digest.hexdigest()
+    if not frozen:
+        return fingerprint
+
+    # the entry dies with the first of its owners, before its id is reused
+    for owner in owners:
+        weakref.finalize(owner, _fingerprints.pop, key, None)
+    _fingerprints[key] = fingerprint
+    return fingerprint
+
+
+def passenger_stats(df):
+    # options and slider bounds for the predictor widgets, one pass per column
+    stats = {
+        "Sex": [str(s) for s in df["Sex"].unique()],
+        "Pclass": sorted(int(c) for c in df["Pclass"].unique()),
+        "Age": {"max": int(df["Age"].max()),
+                "median": int(df["Age"].median())},
+        "Fare": {},
+    }
+    fare_stats = df.groupby("Pclass")["Fare"].agg(["min", "max", "median"])
+    for pclass, row in fare_stats.iterrows():
+        # fares are recorded to 4dp; rounding undoes float32 storage noise
+        stats["Fare"][int(pclass)] = {
+            "min": round(float(row["min"]), 4),
+            "max": round(float(row["max"]), 4),
+            "median": round(float(row["median"]), 4),
+        }
+    return stats
+
+
+def load_passenger_stats():
+    source = dataset_file(PASSENGER_DATA_PATH)
+    return data_cache.get(
+        "passenger_stats", file_version(source),
+        lambda: passenger_stats(load_passenger_data(compact=True)))
@@ -0,0 +1,91 @@
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+from PIL import Image
+
+
+# the options st.pyplot renders with, so cached images look the same
+SAVEFIG_OPTIONS = {"bbox_inches": "tight", "dpi": 200}
+
+
+class FigureCache:
+    """
+    Renders each chart once per key into PNG/SVG bytes and serves those
+    bytes thereafter. draw() must return a new matplotlib Figure; it is
+    closed as soon as it has been saved so no global pyplot state leaks
+    between reruns or sessions.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # pyplot keeps global state, so only one figure is drawn at a time
+        self._render_lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def render(self, key, draw, fmt="png", max_width=None):
+        key = (key, fmt, max_width)
+        image = self._lookup(key)
+        if image is not None:
+            return image
+
+        with self._render_lock:
+            # another session may have drawn it while we waited
+            image = self._lookup(key)
+            if image is not None:
+                return image
+
+            fig = draw()
+            try:
+                buffer = io.BytesIO()
+                fig.savefig(buffer, format=fmt, **SAVEFIG_OPTIONS)
+            finally:
+                plt.close(fig)
+            image = buffer.getvalue()
+            if fmt == "png" and max_width:
+                image = downscale_png(image, max_width)
+
+            with self._lock:
+                self._counters["misses"] += 1
+                self._entries[key] = image
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._counters["evictions"] += 1
+        return image
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return self._entries[key]
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries))
+
+
+def downscale_png(image, max_width):
+    picture = Image.open(io.BytesIO(image))
+    width, height = picture.size
+    if width <= max_width:
+        return image
+    picture = picture.resize((max_width, int(1.0 * height * max_width / width)))
+    buffer = io.BytesIO()
+    picture.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+figure_cache = FigureCache()
+
+
+def render_figure(key, draw, fmt="png", max_width=None):
+    return figure_cache.render(key, draw, fmt, max_width)
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+
+def as_passenger_frame(X, features):
+    # DataFrames are projected onto the pipeline's input features; arrays
+    # (one row or N rows) are assumed to already be in that column order
+    if isinstance(X, pd.DataFrame):
+        return X[features]
+
+    X = np.asarray(X, dtype=object)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    return pd.DataFrame(X, columns=features).infer_objects()
+
+
+def predict_survival_batch(X, pipeline_dc_fe, pipeline_model):
+    X = as_passenger_frame(X, list(pipeline_dc_fe.feature_names_in_))
+    X_dc_fe = pipeline_dc_fe.transform(X)
+    survival_prediction_proba = pipeline_model.predict_proba(X_dc_fe)
+
+    classes = pipeline_model.classes_
+    labels = classes.take(survival_prediction_proba.argmax(axis=1))
+    survival_proba = survival_prediction_proba[:, list(classes).index(1)]
+
+    return labels, survival_proba
@@ -0,0 +1,197 @@
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from src.data_management import PASSENGER_SCHEMA
+from src.model_registry import PIPELINE_DIR, load_pipelines
+from src.machine_learning.batch_prediction import predict_survival_batch
+
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def file_format(file_path):
+    _, extension = os.path.splitext(file_path)
+    if extension in [".parquet", ".pq"]:
+        return "parquet"
+    if extension == ".csv":
+        return "csv"
+    raise ValueError(
+        f"Unsupported file type '{extension}': use .csv or .parquet")
+
+
+def iter_chunks(file_path, columns, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Reads a passenger file chunk_size rows at a time, so memory is bounded
+    by the chunk rather than the file. CSV columns are read with the
+    passenger schema's dtypes (object for columns it does not know) rather
+    than inferred per chunk, so a chunk where a column happens to be
+    empty is typed like every other chunk.
+    """
+    if file_format(file_path) == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(file_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size,
+                                               columns=columns):
+            yield batch.to_pandas()
+    else:
+        dtypes = {col: PASSENGER_SCHEMA.get(col, "object") for col in columns}
+        yield from pd.read_csv(file_path, usecols=columns, dtype=dtypes,
+                               chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """
+    Appends scored chunks to a CSV or Parquet file as they are produced.
+    The Parquet schema is fixed by the first chunk, with all-null columns
+    typed as strings, and later chunks are cast to it.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.format = file_format(file_path)
+        self.rows = 0
+        self._parquet_writer = None
+
+    def write(self, df):
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                schema = pa.schema([
+                    field.with_type(pa.string())
+                    if pa.types.is_null(field.type) else field
+                    for field in table.schema]).remove_metadata()
+                self._parquet_writer = pq.ParquetWriter(self.file_path,
+                                                        schema)
+            self._parquet_writer.write_table(
+                table.cast(self._parquet_writer.schema))
+        else:
+            df.to_csv(self.file_path, mode="w" if self.rows == 0 else "a",
+                      header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def score_chunk(chunk, version, keep_columns=None):
+    pipeline_dc_fe, pipeline_model = load_pipelines(version)
+    labels, survival_proba = predict_survival_batch(
+        chunk, pipeline_dc_fe, pipeline_model)
+
+    scored = chunk[keep_columns or []].reset_index(drop=True)
+    scored["Survived"] = labels
+    scored["survival_probability"] = survival_proba
+    return scored
+
+
+def init_worker(version):
+    # one BLAS/OpenMP thread per process, so the pool, not nested thread
+    # pools, decides how many cores are busy; the pipelines are loaded once
+    # here and served from the worker's registry for every chunk after
+    threadpool_limits(1)
+    load_pipelines(version)
+
+
+def score_chunks(chunks, version="v6", keep_columns=None, workers=1):
+    """
+    Yields each chunk scored by score_chunk, in input order. With more than
+    one worker the chunks are shared across a process pool, keeping at most
+    two chunks per worker in flight so memory stays bounded.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield score_chunk(chunk, version, keep_columns)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(version,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(
+                pool.submit(score_chunk, chunk, version, keep_columns))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def predict_survival_parallel(X, version="v6", workers=os.cpu_count(),
+                              chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    predict_survival_batch for a frame of passengers, sharded across a
+    process pool. Returns (labels, survival_proba) in input order.
+    """
+    chunks = (X.iloc[start:start + chunk_size]
+              for start in range(0, len(X), chunk_size))
+    scored = list(score_chunks(chunks, version, workers=workers))
+    if not scored:
+        return np.array([]), np.array([])
+    scored = pd.concat(scored, ignore_index=True)
+    return scored["Survived"].to_numpy(), \
+        scored["survival_probability"].to_numpy()
+
+
+def score_file(input_path, output_path, version="v6",
+               chunk_size=DEFAULT_CHUNK_SIZE, keep_columns=None, workers=1):
+    """
+    Scores every passenger in input_path with a pipeline version and
+    writes their predicted label and survival probability to output_path,
+    one chunk at a time, optionally across a pool of worker processes.
+    keep_columns (e.g. PassengerId) are copied through to the output.
+    Returns the number of rows scored.
+    """
+    pipeline_dc_fe, _ = load_pipelines(version)
+    keep_columns = list(keep_columns or [])
+    features = list(pipeline_dc_fe.feature_names_in_)
+    columns = keep_columns + [col for col in features
+                              if col not in keep_columns]
+
+    with ChunkWriter(output_path) as writer:
+        chunks = iter_chunks(input_path, columns, chunk_size)
+        for scored in score_chunks(chunks, version, keep_columns, workers):
+            writer.write(scored)
+    return writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Score a CSV or Parquet file of passengers in chunks.")
+    parser.add_argument("input", help="passenger records (.csv or .parquet)")
+    parser.add_argument("output", help="where to write predictions "
+                                       "(.csv or .parquet)")
+    parser.add_argument("--version", default="v6",
+                        help=f"pipeline version under {PIPELINE_DIR}")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--keep", nargs="*", default=[], metavar="COLUMN",
+                        help="input columns to copy to the output, "
+                             "e.g. PassengerId")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes to score chunks with "
+                             f"(this machine has {os.cpu_count()} cores)")
+    args = parser.parse_args(argv)
+
+    rows = score_file(args.input, args.output, version=args.version,
+                      chunk_size=args.chunk_size, keep_columns=args.keep,
+                      workers=args.workers)
+    print(f"* {rows} passengers scored to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
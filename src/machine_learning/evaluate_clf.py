@@ -1,21 +1,47 @@
+import json
+import os
+import tempfile
+import threading
+
 import streamlit as st
 import pandas as pd
 from sklearn.metrics import classification_report, confusion_matrix
+from src.data_management import load_pipeline_split
+from src.model_registry import file_digest, load_pipelines, pipeline_path
+from src.storage import dataset_file
 
 
-# code copied from "Modeling and Evaluation" notebooks
-def confusion_matrix_and_report(X, y, pipeline, label_map):
+EVALUATION_METRICS_FILE = "evaluation_metrics.json"
+EVALUATION_SOURCES = ["pipeline_dc_fe.pkl", "pipeline_clf.pkl",
+                      "features_importance.png", "X_train.csv", "X_test.csv",
+                      "y_train.csv", "y_test.csv"]
+
 
+def classification_metrics(X, y, pipeline, label_map):
     prediction = pipeline.predict(X)
+    return {
+        "confusion_matrix": confusion_matrix(
+            y_true=prediction, y_pred=y).tolist(),
+        "classification_report": classification_report(
+            y, prediction, target_names=label_map),
+    }
 
+
+def show_classification_metrics(metrics, label_map):
     st.write('#### Confusion Matrix')
-    st.code(pd.DataFrame(confusion_matrix(y_true=prediction, y_pred=y),
+    st.code(pd.DataFrame(metrics["confusion_matrix"],
                          columns=[["Actual " + sub for sub in label_map]],
                          index=[["Prediction " + sub for sub in label_map]]
                          ))
 
     st.write('#### Classification Report')
-    st.code(classification_report(y, prediction, target_names=label_map), "\n")
+    st.code(metrics["classification_report"], "\n")
+
+
+# code copied from "Modeling and Evaluation" notebooks
+def confusion_matrix_and_report(X, y, pipeline, label_map):
+    show_classification_metrics(
+        classification_metrics(X, y, pipeline, label_map), label_map)
 
 
 # code copied from "Modeling and Evaluation" notebooks
@@ -25,3 +51,103 @@ def clf_performance(X_train, y_train, X_test, y_test, pipeline, label_map):
 
     st.info("Test Set")
     confusion_matrix_and_report(X_test, y_test, pipeline, label_map)
+
+
+def show_clf_performance(evaluation):
+    label_map = evaluation["label_map"]
+    st.info("Train Set")
+    show_classification_metrics(evaluation["train"], label_map)
+
+    st.info("Test Set")
+    show_classification_metrics(evaluation["test"], label_map)
+
+
+def compute_evaluation_metrics(version, label_map):
+    pipeline_dc_fe, pipeline_model = load_pipelines(version)
+    X_train = load_pipeline_split(version, "X_train", mmap=True)
+    X_test = load_pipeline_split(version, "X_test", mmap=True)
+    y_train = load_pipeline_split(version, "y_train", mmap=True).values
+    y_test = load_pipeline_split(version, "y_test", mmap=True).values
+
+    return {
+        "label_map": list(label_map),
+        "features": X_train.columns.to_list(),
+        "pipeline_dc_fe": str(pipeline_dc_fe),
+        "pipeline_clf": str(pipeline_model),
+        "train": classification_metrics(
+            X_train, y_train, pipeline_model, label_map),
+        "test": classification_metrics(
+            X_test, y_test, pipeline_model, label_map),
+    }
+
+
+def read_metrics(metrics_path):
+    # a missing, truncated or corrupt file is recomputed, not fatal
+    try:
+        with open(metrics_path) as f:
+            metrics = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return metrics if isinstance(metrics, dict) else None
+
+
+def write_metrics(metrics_path, metrics):
+    # written to a temporary file and renamed over the old one, so other
+    # processes never read it half-written
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(metrics_path), suffix=".tmp")
+    except OSError:
+        # read-only slug: keep serving from memory
+        return
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(metrics, f, indent=2)
+        # mkstemp creates the file private to this user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, metrics_path)
+    except OSError:
+        os.remove(tmp_path)
+
+
+_evaluation_cache = {}
+_evaluation_lock = threading.Lock()
+
+
+def load_evaluation(version, label_map):
+    """
+    Evaluation metrics for a pipeline version, computed once and persisted
+    next to its artifacts. They are recomputed only when the content of
+    a source artifact changes.
+    """
+    sources = {name: dataset_file(pipeline_path(version, name), matrix=True)
+               for name in EVALUATION_SOURCES}
+    signature = tuple((os.stat(path).st_mtime_ns, os.stat(path).st_size)
+                      for path in sources.values()) + tuple(label_map)
+
+    with _evaluation_lock:
+        entry = _evaluation_cache.get(version)
+        if entry is not None and entry["signature"] == signature:
+            return entry["evaluation"]
+
+        # keyed by the file actually hashed, e.g. X_train.npy, not X_train.csv
+        digests = {os.path.basename(path): file_digest(path)
+                   for path in sources.values()}
+        metrics_path = pipeline_path(version, EVALUATION_METRICS_FILE)
+        metrics = read_metrics(metrics_path)
+        if metrics is not None and (
+                metrics.get("sources") != digests
+                or metrics.get("label_map") != list(label_map)):
+            metrics = None
+
+        if metrics is None:
+            metrics = compute_evaluation_metrics(version, label_map)
+            metrics["sources"] = digests
+            write_metrics(metrics_path, metrics)
+
+        with open(sources["features_importance.png"], "rb") as f:
+            evaluation = dict(metrics, features_importance=f.read())
+
+        _evaluation_cache[version] = {"signature": signature,
+                                      "evaluation": evaluation}
+        return evaluation
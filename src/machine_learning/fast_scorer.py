@@ -0,0 +1,321 @@
+import argparse
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+from feature_engine.encoding import OneHotEncoder
+from feature_engine.imputation import CategoricalImputer, MeanMedianImputer
+from feature_engine.selection import DropFeatures
+from sklearn.ensemble import (ExtraTreesClassifier, GradientBoostingClassifier,
+                              RandomForestClassifier)
+from sklearn.feature_selection import SelectFromModel
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from src.model_registry import (
+    load_pipelines, pipeline_digests, pipeline_path, registry)
+from src.machine_learning.batch_prediction import predict_survival_batch
+
+
+FAST_SCORER_FILE = "pipeline_fast.pkl"
+
+
+# Export: fitted pipelines -> flat dict of constants and arrays
+
+def compile_dc_fe(pipeline_dc_fe):
+    features = list(pipeline_dc_fe.feature_names_in_)
+    steps = []
+
+    for name, step in pipeline_dc_fe.steps:
+        if isinstance(step, DropFeatures):
+            dropped = list(step.features_to_drop_)
+            features = [f for f in features if f not in dropped]
+            steps.append(("drop", dropped))
+        elif isinstance(step, MeanMedianImputer):
+            steps.append(("impute_numerical", dict(step.imputer_dict_)))
+        elif isinstance(step, CategoricalImputer):
+            steps.append(("impute_categorical", dict(step.imputer_dict_)))
+        elif isinstance(step, OneHotEncoder):
+            encoder_dict = {var: list(step.encoder_dict_[var])
+                            for var in step.variables_}
+            features = [f for f in features if f not in encoder_dict]
+            for var, categories in encoder_dict.items():
+                features += [f"{var}_{category}" for category in categories]
+            steps.append(("one_hot", encoder_dict))
+        else:
+            raise ValueError(
+                f"Cannot compile step '{name}' ({type(step).__name__})")
+
+    return steps, features
+
+
+def stack_trees(trees, normalise):
+    n_nodes = max(tree.tree_.node_count for tree in trees)
+    n_outputs = trees[0].tree_.value.shape[-1]
+    shape = (len(trees), n_nodes)
+
+    left = np.full(shape, -1, dtype=np.intp)
+    right = np.full(shape, -1, dtype=np.intp)
+    feature = np.zeros(shape, dtype=np.intp)
+    threshold = np.zeros(shape, dtype=np.float64)
+    value = np.zeros(shape + (n_outputs,), dtype=np.float64)
+
+    for i, estimator in enumerate(trees):
+        tree = estimator.tree_
+        n = tree.node_count
+        left[i, :n] = tree.children_left
+        right[i, :n] = tree.children_right
+        # leaves carry feature -2; any valid column works as they are never split
+        feature[i, :n] = np.maximum(tree.feature, 0)
+        threshold[i, :n] = tree.threshold
+        node_value = tree.value[:, 0, :]
+        if normalise:
+            normaliser = node_value.sum(axis=1, keepdims=True)
+            normaliser[normaliser == 0] = 1
+            node_value = node_value / normaliser
+        value[i, :n] = node_value
+
+    return {
+        "left": left, "right": right, "feature": feature,
+        "threshold": threshold, "value": value,
+        "max_depth": max(tree.tree_.max_depth for tree in trees),
+    }
+
+
+def compile_model(model):
+    if len(model.classes_) != 2:
+        raise ValueError("Only binary classifiers can be compiled")
+
+    if isinstance(model, GradientBoostingClassifier):
+        n_features = model.n_features_in_
+        return {
+            "kind": "gradient_boosting",
+            "init": float(model._raw_predict_init(
+                np.zeros((1, n_features), dtype=np.float32))[0, 0]),
+            "learning_rate": float(model.learning_rate),
+            "trees": stack_trees(model.estimators_[:, 0], normalise=False),
+        }
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        return {"kind": "forest",
+                "trees": stack_trees(model.estimators_, normalise=True)}
+    if isinstance(model, DecisionTreeClassifier):
+        return {"kind": "forest",
+                "trees": stack_trees([model], normalise=True)}
+    if isinstance(model, LogisticRegression):
+        return {"kind": "logistic",
+                "coef": model.coef_[0].astype(np.float64),
+                "intercept": float(model.intercept_[0])}
+
+    raise ValueError(f"Cannot compile model {type(model).__name__}")
+
+
+def compile_pipelines(pipeline_dc_fe, pipeline_model):
+    dc_fe_steps, features = compile_dc_fe(pipeline_dc_fe)
+    compiled = {
+        "input_features": list(pipeline_dc_fe.feature_names_in_),
+        "dc_fe_steps": dc_fe_steps,
+        "features": features,
+        "scaler_mean": None,
+        "scaler_scale": None,
+        "support": None,
+        "classes": np.asarray(pipeline_model.classes_),
+    }
+
+    for name, step in pipeline_model.steps[:-1]:
+        if isinstance(step, StandardScaler):
+            compiled["scaler_mean"] = step.mean_ if step.with_mean else None
+            compiled["scaler_scale"] = step.scale_ if step.with_std else None
+        elif isinstance(step, SelectFromModel):
+            compiled["support"] = step.get_support()
+        else:
+            raise ValueError(
+                f"Cannot compile step '{name}' ({type(step).__name__})")
+
+    compiled["model"] = compile_model(pipeline_model.steps[-1][1])
+    return compiled
+
+
+# Evaluation: plain NumPy over the compiled representation
+
+def is_missing(values):
+    if values.dtype.kind == "f":
+        return np.isnan(values)
+    return np.frompyfunc(lambda v: v is None or v != v, 1, 1)(values).astype(bool)
+
+
+def check_categories(variable, values, categories):
+    # the encoder raises on missing values; an unseen category would be
+    # encoded as all zeros, so it is rejected as in the scoring service
+    if is_missing(values).any():
+        raise ValueError(f"Missing values in {variable}")
+    unseen = set(values) - set(categories)
+    if unseen:
+        raise ValueError(f"Unknown {variable} {sorted(map(str, unseen))}"
+                         f", expected one of {list(categories)}")
+
+
+def predict_trees(trees, X):
+    X = X.astype(np.float32)
+    n_trees = trees["left"].shape[0]
+    tree_idx = np.arange(n_trees)
+    row_idx = np.arange(X.shape[0])[:, None]
+    node = np.zeros((X.shape[0], n_trees), dtype=np.intp)
+
+    for _ in range(trees["max_depth"]):
+        left = trees["left"][tree_idx, node]
+        go_left = (X[row_idx, trees["feature"][tree_idx, node]]
+                   <= trees["threshold"][tree_idx, node])
+        next_node = np.where(go_left, left, trees["right"][tree_idx, node])
+        node = np.where(left == -1, node, next_node)
+
+    return trees["value"][tree_idx, node]
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class FastScorer:
+    """
+    Scores passengers from a compiled pipeline pair with plain NumPy,
+    returning the same (labels, survival probabilities) as
+    predict_survival_batch.
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        self.input_features = compiled["input_features"]
+
+    def columns(self, X):
+        if isinstance(X, pd.DataFrame):
+            return {f: X[f].to_numpy() for f in self.input_features}
+        if isinstance(X, dict):
+            return {f: np.atleast_1d(np.asarray(X[f]))
+                    for f in self.input_features}
+
+        X = np.asarray(X, dtype=object)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return {f: X[:, i] for i, f in enumerate(self.input_features)}
+
+    def transform(self, X):
+        columns = self.columns(X)
+
+        for kind, params in self.compiled["dc_fe_steps"]:
+            if kind == "drop":
+                for f in params:
+                    columns.pop(f, None)
+            elif kind == "impute_numerical":
+                for f, fill in params.items():
+                    values = columns[f].astype(np.float64)
+                    columns[f] = np.where(np.isnan(values), fill, values)
+            elif kind == "impute_categorical":
+                for f, fill in params.items():
+                    values = columns[f].astype(object)
+                    values[is_missing(values)] = fill
+                    columns[f] = values
+            elif kind == "one_hot":
+                for f, categories in params.items():
+                    values = columns.pop(f)
+                    check_categories(f, values, categories)
+                    for category in categories:
+                        columns[f"{f}_{category}"] = (values == category)
+
+        X = np.column_stack([np.asarray(columns[f], dtype=np.float64)
+                             for f in self.compiled["features"]])
+        # the pipelines' model rejects what imputation left missing, while
+        # the trees here would silently send NaN down the right branch
+        missing = [f for f, column in zip(self.compiled["features"], X.T)
+                   if np.isnan(column).any()]
+        if missing:
+            raise ValueError(f"Missing values in {missing} after imputation")
+
+        if self.compiled["scaler_mean"] is not None:
+            X = X - self.compiled["scaler_mean"]
+        if self.compiled["scaler_scale"] is not None:
+            X = X / self.compiled["scaler_scale"]
+        if self.compiled["support"] is not None:
+            X = X[:, self.compiled["support"]]
+        return X
+
+    def predict_proba(self, X):
+        X = self.transform(X)
+        model = self.compiled["model"]
+
+        if model["kind"] == "gradient_boosting":
+            raw = model["init"] + model["learning_rate"] * \
+                predict_trees(model["trees"], X)[:, :, 0].sum(axis=1)
+            survival_proba = sigmoid(raw)
+        elif model["kind"] == "logistic":
+            survival_proba = sigmoid(X @ model["coef"] + model["intercept"])
+        else:
+            survival_proba = predict_trees(model["trees"], X)[:, :, 1].mean(axis=1)
+
+        return np.column_stack([1 - survival_proba, survival_proba])
+
+    def predict(self, X):
+        proba = self.predict_proba(X)
+        classes = self.compiled["classes"]
+        labels = classes.take(proba.argmax(axis=1))
+        return labels, proba[:, list(classes).index(1)]
+
+
+def export_fast_scorer(version):
+    pipeline_dc_fe, pipeline_model = load_pipelines(version)
+    compiled = compile_pipelines(pipeline_dc_fe, pipeline_model)
+    compiled["sources"] = pipeline_digests(version)
+    file_path = pipeline_path(version, FAST_SCORER_FILE)
+    joblib.dump(value=compiled, filename=file_path)
+    return file_path
+
+
+def load_fast_scorer(version="v6"):
+    file_path = pipeline_path(version, FAST_SCORER_FILE)
+    compiled = registry.load(file_path)
+    if compiled.get("sources") != pipeline_digests(version):
+        raise ValueError(f"{file_path} was compiled from other pipelines; "
+                         "rerun python -m src.machine_learning.fast_scorer")
+    return FastScorer(compiled)
+
+
+def check_parity(version, X, atol=1e-9):
+    pipeline_dc_fe, pipeline_model = load_pipelines(version)
+    labels, survival_proba = predict_survival_batch(
+        X, pipeline_dc_fe, pipeline_model)
+    fast_labels, fast_survival_proba = load_fast_scorer(version).predict(X)
+
+    max_abs_diff = float(np.abs(survival_proba - fast_survival_proba).max())
+    label_mismatches = int((labels != fast_labels).sum())
+    return {
+        "rows": len(labels),
+        "max_abs_diff": max_abs_diff,
+        "label_mismatches": label_mismatches,
+        "passed": label_mismatches == 0 and max_abs_diff <= atol,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compile a pipeline version into a NumPy fast-path scorer "
+                    "and check it against the original pipelines.")
+    parser.add_argument("--version", default="v6")
+    parser.add_argument(
+        "--parity-data", default="outputs/datasets/collection/titanic_passengers.csv")
+    parser.add_argument("--atol", type=float, default=1e-9)
+    args = parser.parse_args(argv)
+
+    file_path = export_fast_scorer(args.version)
+    print(f"* Fast scorer written to {file_path}")
+
+    parity = check_parity(args.version, pd.read_csv(args.parity_data),
+                          atol=args.atol)
+    print(f"* Parity over {parity['rows']} rows: max abs difference "
+          f"{parity['max_abs_diff']:.3g}, {parity['label_mismatches']} label "
+          f"mismatches")
+    return 0 if parity["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
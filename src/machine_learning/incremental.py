@@ -0,0 +1,262 @@
+import argparse
+import copy
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import (
+    AdaBoostClassifier, ExtraTreesClassifier, GradientBoostingClassifier,
+    RandomForestClassifier)
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import BaseDecisionTree
+
+from src.data_management import (
+    PASSENGER_DATA_PATH, PASSENGER_SCHEMA, load_pipeline_split)
+from src.model_registry import load_pipelines, pipeline_path
+from src.storage import read_dataset
+from src.machine_learning.batch_scoring import file_format
+from src.machine_learning.training import (
+    BEST_FEATURES, next_version, save_version, split_train_test)
+
+
+INCREMENTAL_STATE_FILE = "incremental_state.json"
+# new trees or boosting stages per update, as a share of the current ensemble
+EXTRA_ESTIMATORS_FRACTION = 0.1
+
+
+def read_labelled_rows(file_path):
+    if file_format(file_path) == "parquet":
+        df = pd.read_parquet(file_path)
+    else:
+        df = pd.read_csv(file_path)
+    missing = [col for col in BEST_FEATURES + ["Survived"]
+               if col not in df.columns]
+    if missing:
+        raise ValueError(f"{file_path} is missing columns {missing}")
+    return df[BEST_FEATURES], df["Survived"].astype("int64")
+
+
+def load_state(version, variables):
+    """
+    The imputer's sufficient statistics for a version: the value counts of
+    the imputed variables in its raw training rows. Versions trained from
+    scratch have no state file, so their counts are rebuilt from the same
+    split train() used.
+    """
+    state_path = pipeline_path(version, INCREMENTAL_STATE_FILE)
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        state["value_counts"] = {
+            variable: pd.Series(dict((value, count) for value, count in pairs))
+            for variable, pairs in state["value_counts"].items()}
+        return state
+
+    X_train, _, _, _ = split_train_test(
+        read_dataset(PASSENGER_DATA_PATH, schema=PASSENGER_SCHEMA))
+    return {"base_version": version, "rows_added": 0, "value_counts": {
+        variable: X_train[variable].value_counts() for variable in variables}}
+
+
+def save_state(version, state):
+    state = dict(state, value_counts={
+        variable: [[float(value), int(count)]
+                   for value, count in counts.sort_index().items()]
+        for variable, counts in state["value_counts"].items()})
+    with open(pipeline_path(version, INCREMENTAL_STATE_FILE), "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def median_from_counts(counts):
+    counts = counts.sort_index()
+    cumulative = counts.cumsum().to_numpy()
+    n = cumulative[-1]
+    lower = counts.index[np.searchsorted(cumulative, (n - 1) // 2 + 1)]
+    upper = counts.index[np.searchsorted(cumulative, n // 2 + 1)]
+    return (lower + upper) / 2
+
+
+def update_imputer(imputer, value_counts):
+    for variable in imputer.variables_:
+        counts = value_counts[variable]
+        if imputer.imputation_method == "median":
+            imputer.imputer_dict_[variable] = float(median_from_counts(counts))
+        else:
+            imputer.imputer_dict_[variable] = float(
+                np.average(counts.index, weights=counts.to_numpy()))
+
+
+def check_categories(encoder, X):
+    for variable, categories in encoder.encoder_dict_.items():
+        unseen = set(X[variable].dropna().unique()) - set(categories)
+        if unseen:
+            raise ValueError(f"New {variable} categories {sorted(unseen)} "
+                             "need a full retrain")
+
+
+def tree_estimators(model):
+    if isinstance(model, BaseDecisionTree):
+        return [model]
+    if isinstance(model, GradientBoostingClassifier):
+        return list(model.estimators_.ravel())
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier,
+                          AdaBoostClassifier)):
+        trees = list(model.estimators_)
+        if all(isinstance(tree, BaseDecisionTree) for tree in trees):
+            return trees
+    return None
+
+
+def remap_scaled_model(model, old_mean, old_scale, new_mean, new_scale, X):
+    """
+    Re-expresses a model fitted on inputs standardised with the old scaler
+    moments so it gives the same predictions on inputs standardised with
+    the new ones. Linear coefficients are remapped exactly. Tree thresholds
+    are moved to the midpoint of the same pair of neighbouring values of X
+    (the unscaled training rows) in the new scale, so every training row
+    takes the same path despite trees comparing in float32. Updates the
+    model in place and returns False for models that cannot be remapped.
+    """
+    if isinstance(model, LogisticRegression):
+        shift = (new_mean - old_mean) / old_scale
+        model.intercept_ = model.intercept_ + model.coef_ @ shift
+        model.coef_ = model.coef_ * new_scale / old_scale
+        return True
+
+    trees = tree_estimators(model)
+    if trees is None:
+        return False
+
+    X = np.asarray(X, dtype=float)
+    for tree in trees:
+        features, thresholds = tree.tree_.feature, tree.tree_.threshold
+        for f in np.unique(features[features >= 0]):
+            nodes = np.flatnonzero(features == f)
+            raw = np.unique(X[:, f])
+            old_values = ((raw - old_mean[f]) / old_scale[f]).astype(np.float32)
+            new_values = ((raw - new_mean[f]) / new_scale[f]).astype(np.float32)
+            new_values = new_values.astype(float)
+
+            left = np.searchsorted(old_values, thresholds[nodes], side="right")
+            inside = (left > 0) & (left < len(raw))
+            # outside the training range a plain change of units will do
+            remapped = (thresholds[nodes] * old_scale[f] + old_mean[f]
+                        - new_mean[f]) / new_scale[f]
+            remapped[inside] = (new_values[left[inside] - 1]
+                                + new_values[left[inside]]) / 2
+            thresholds[nodes] = remapped
+    return True
+
+
+def update_model(model, X_new, y_new, X_all, y_all,
+                 extra_fraction=EXTRA_ESTIMATORS_FRACTION):
+    """
+    Updates a fitted model with new rows without refitting it from
+    scratch: ensembles grow a few trees or stages on all rows, logistic
+    regression restarts from its current coefficients and anything with
+    partial_fit sees only the new rows. Returns the method used, or None
+    when the model needs a full refit.
+    """
+    if isinstance(model, (GradientBoostingClassifier, RandomForestClassifier,
+                          ExtraTreesClassifier)):
+        n_estimators = model.n_estimators
+        extra = max(1, math.ceil(n_estimators * extra_fraction))
+        model.set_params(warm_start=True, n_estimators=n_estimators + extra)
+        model.fit(X_all, y_all)
+        model.set_params(warm_start=False)
+        return "warm_start"
+    if isinstance(model, LogisticRegression):
+        model.set_params(warm_start=True)
+        model.fit(X_all, y_all)
+        model.set_params(warm_start=False)
+        return "warm_start"
+    if hasattr(model, "partial_fit"):
+        model.partial_fit(X_new, y_new)
+        return "partial_fit"
+    return None
+
+
+def incremental_update(rows_path, base_version="v6", version=None,
+                       extra_fraction=EXTRA_ESTIMATORS_FRACTION,
+                       full_refit=False):
+    """
+    Builds a new version from base_version plus new labelled rows. The
+    imputer statistics and scaler moments are updated incrementally, the
+    model is remapped onto the new scaler and then warm-started or
+    partially fitted; models that support neither are refitted on the
+    base version's training rows plus the new ones.
+    Returns the new version's folder and the update method used.
+    """
+    version = version or next_version()
+    X_new, y_new = read_labelled_rows(rows_path)
+
+    # the registry's copies are shared, so update private ones
+    pipeline_data_cleaning_feat_eng, pipeline = copy.deepcopy(
+        load_pipelines(base_version))
+    check_categories(pipeline_data_cleaning_feat_eng['categorical_encoder'],
+                     X_new)
+
+    imputer = pipeline_data_cleaning_feat_eng['median']
+    state = load_state(base_version, imputer.variables_)
+    for variable, counts in state["value_counts"].items():
+        state["value_counts"][variable] = counts.add(
+            X_new[variable].dropna().value_counts(), fill_value=0)
+    update_imputer(imputer, state["value_counts"])
+
+    X_train = load_pipeline_split(base_version, "X_train")
+    y_train = load_pipeline_split(base_version, "y_train")["Survived"]
+    X_new = pipeline_data_cleaning_feat_eng.transform(X_new)[X_train.columns]
+    X_all = pd.concat([X_train, X_new], ignore_index=True)
+    y_all = pd.concat([y_train, y_new], ignore_index=True)
+
+    scaler, model = pipeline['scaler'], pipeline['model']
+    old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+    scaler.partial_fit(X_new)
+
+    method = None
+    if not full_refit and remap_scaled_model(model, old_mean, old_scale,
+                                             scaler.mean_, scaler.scale_,
+                                             X_all):
+        method = update_model(model, scaler.transform(X_new), y_new,
+                              scaler.transform(X_all), y_all, extra_fraction)
+    if method is None:
+        pipeline = clone(pipeline).fit(X_all, y_all)
+        method = "full_refit"
+
+    file_path = save_version(
+        version, pipeline_data_cleaning_feat_eng, pipeline, X_all, y_all,
+        load_pipeline_split(base_version, "X_test"),
+        load_pipeline_split(base_version, "y_test"))
+    save_state(version, dict(state, base_version=base_version,
+                             rows_added=state["rows_added"] + len(X_new),
+                             method=method))
+    return file_path, method
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Update a pipeline version with new labelled passengers "
+                    "and save it as a new version.")
+    parser.add_argument("rows", help="labelled passengers (.csv or .parquet) "
+                                     "with Sex, Fare, Age, Pclass, Survived")
+    parser.add_argument("--base", default="v6")
+    parser.add_argument("--version", help="defaults to the next free vN")
+    parser.add_argument("--extra-fraction", type=float,
+                        default=EXTRA_ESTIMATORS_FRACTION,
+                        help="trees or stages added to ensembles, as a share "
+                             "of their current size")
+    parser.add_argument("--full-refit", action="store_true",
+                        help="refit the model from scratch on all rows")
+    args = parser.parse_args(argv)
+
+    file_path, method = incremental_update(
+        args.rows, args.base, args.version,
+        extra_fraction=args.extra_fraction, full_refit=args.full_refit)
+    print(f"* Pipeline updated by {method} and written to {file_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import bisect
+import copy
+import itertools
+import threading
+import time
+
+import pandas as pd
+
+from src.model_registry import load_pipelines
+
+
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+ROWS_BUCKETS = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+BYTES_BUCKETS = [2**10, 2**13, 2**16, 2**20, 2**23, 2**26, 2**30]
+
+METRICS = {
+    "pipeline_step_seconds": ("Wall time of a pipeline step call",
+                              LATENCY_BUCKETS),
+    "pipeline_step_rows": ("Rows passed to a pipeline step call",
+                           ROWS_BUCKETS),
+    "pipeline_step_output_bytes": ("Bytes allocated for a pipeline step's "
+                                   "output", BYTES_BUCKETS),
+}
+# the step methods a fitted Pipeline calls when transforming or predicting
+INSTRUMENTED_METHODS = ["transform", "predict", "predict_proba",
+                        "predict_log_proba", "decision_function"]
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        return list(itertools.accumulate(self.counts))
+
+
+class HistogramRegistry:
+    """
+    Histograms of pipeline step calls, keyed by metric name and labels
+    (pipeline, version, step, method), exportable as Prometheus text or
+    as a JSON-ready dict.
+    """
+
+    def __init__(self, metrics=METRICS):
+        self.metrics = metrics
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(self.metrics[name][1])
+                self._histograms[key] = histogram
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def to_json(self):
+        with self._lock:
+            return [{
+                "metric": name,
+                "labels": dict(labels),
+                "buckets": dict(zip([str(b) for b in histogram.buckets]
+                                    + ["+Inf"], histogram.cumulative())),
+                "sum": histogram.sum,
+                "count": histogram.count,
+            } for (name, labels), histogram in sorted(self._histograms.items())]
+
+    def to_prometheus(self):
+        lines = []
+        series = self.to_json()
+        for name, (description, _) in self.metrics.items():
+            rows = [row for row in series if row["metric"] == name]
+            if not rows:
+                continue
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} histogram")
+            for row in rows:
+                labels = ",".join(f'{key}="{value}"'
+                                  for key, value in row["labels"].items())
+                for bound, count in row["buckets"].items():
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} '
+                                 f'{count}')
+                lines.append(f"{name}_sum{{{labels}}} {row['sum']}")
+                lines.append(f"{name}_count{{{labels}}} {row['count']}")
+        return "\n".join(lines) + "\n"
+
+
+step_metrics = HistogramRegistry()
+
+
+def output_bytes(output):
+    if isinstance(output, pd.DataFrame):
+        return int(output.memory_usage(index=False).sum())
+    return int(getattr(output, "nbytes", 0))
+
+
+class InstrumentedStep:
+    """
+    Stands in for a fitted pipeline step, timing each transform/predict
+    call into a HistogramRegistry and delegating everything else to the
+    step itself.
+    """
+
+    def __init__(self, step, labels, registry):
+        self._step = step
+        self._labels = labels
+        self._registry = registry
+
+    def __getattr__(self, name):
+        if name in ("_step", "_labels", "_registry"):
+            # not yet set, e.g. while being copied or unpickled
+            raise AttributeError(name)
+        attribute = getattr(self._step, name)
+        if name not in INSTRUMENTED_METHODS:
+            return attribute
+
+        def instrumented(X, *args, **kwargs):
+            start = time.perf_counter()
+            output = attribute(X, *args, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            labels = dict(self._labels, method=name)
+            self._registry.observe("pipeline_step_seconds", labels, elapsed)
+            self._registry.observe("pipeline_step_rows", labels, len(X))
+            self._registry.observe("pipeline_step_output_bytes", labels,
+                                   output_bytes(output))
+            return output
+
+        return instrumented
+
+    def __repr__(self):
+        return repr(self._step)
+
+
+def instrument_pipeline(pipeline, pipeline_name, version=None,
+                        registry=step_metrics):
+    """
+    A copy of a fitted Pipeline whose steps record per-step timings. The
+    fitted steps are shared, not copied, so the original pipeline and the
+    pickle on disk are untouched.
+    """
+    instrumented = copy.copy(pipeline)
+    labels = {"pipeline": pipeline_name}
+    if version is not None:
+        labels["version"] = version
+    instrumented.steps = [
+        (name, InstrumentedStep(step, dict(labels, step=name), registry))
+        for name, step in pipeline.steps]
+    return instrumented
+
+
+_instrumented = {}
+_instrumented_lock = threading.Lock()
+
+
+def load_instrumented_pipelines(version="v6", registry=step_metrics):
+    """
+    load_pipelines, with both pipelines instrumented; the wrappers are
+    rebuilt whenever the registry reloads the underlying pipelines.
+    """
+    pipelines = load_pipelines(version)
+    key = (version, id(registry))
+    with _instrumented_lock:
+        entry = _instrumented.get(key)
+        if entry is None or entry[0] is not pipelines[0] \
+                or entry[1] is not pipelines[1]:
+            entry = pipelines + tuple(
+                instrument_pipeline(pipeline, name, version, registry)
+                for pipeline, name in zip(pipelines, ["pipeline_dc_fe",
+                                                      "pipeline_clf"]))
+            _instrumented[key] = entry
+    return entry[2], entry[3]
@@ -0,0 +1,149 @@
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.data_management import load_passenger_stats
+from src.model_registry import (
+    load_pipelines, pipeline_digests, pipeline_path, registry)
+from src.machine_learning.batch_prediction import predict_survival_batch
+
+
+PREDICTION_GRID_FILE = "prediction_grid.pkl"
+
+
+def extra_fares(fare_stats, fare_steps):
+    # the slider starts at the class median and ends at the exact maximum,
+    # neither of which need lie on the £1 steps up from the minimum
+    extras = []
+    for fare in (fare_stats["median"], fare_stats["max"]):
+        step = fare - fare_stats["min"]
+        on_steps = abs(step - round(step)) <= 1e-9 and round(step) < fare_steps
+        if not on_steps and fare not in extras:
+            extras.append(fare)
+    return extras
+
+
+def grid_axes(stats):
+    # mirrors the options and slider ranges offered by DrawInputsWidgets
+    pclasses = stats["Pclass"]
+    fares = [stats["Fare"][pclass] for pclass in pclasses]
+    fare_steps = [int(np.floor(f["max"] - f["min"])) + 1 for f in fares]
+    fare_extra = [extra_fares(f, steps) for f, steps in zip(fares, fare_steps)]
+    return {
+        "sexes": stats["Sex"],
+        "pclasses": pclasses,
+        "age_max": stats["Age"]["max"],
+        "fare_min": np.array([f["min"] for f in fares]),
+        "fare_steps": np.array(fare_steps),
+        "fare_extra": fare_extra,
+        "fare_count": np.array([steps + len(extra) for steps, extra
+                                in zip(fare_steps, fare_extra)]),
+    }
+
+
+def grid_frame(axes):
+    # one block per class, each laid out as [sex, age, fare] in C order,
+    # with the class's extra fares after its £1 steps
+    ages = np.arange(axes["age_max"] + 1)
+    blocks = []
+    for pclass, fare_min, fare_steps, fare_extra in zip(
+            axes["pclasses"], axes["fare_min"], axes["fare_steps"],
+            axes["fare_extra"]):
+        fares = np.concatenate([fare_min + np.arange(fare_steps), fare_extra])
+        sex, age, fare = np.meshgrid(
+            np.array(axes["sexes"], dtype=object), ages, fares, indexing="ij")
+        blocks.append(pd.DataFrame({
+            "Sex": sex.ravel(), "Age": age.ravel().astype(float),
+            "Pclass": pclass, "Fare": fare.ravel()}))
+    return pd.concat(blocks, ignore_index=True)
+
+
+def build_prediction_grid(version, stats):
+    axes = grid_axes(stats)
+    pipeline_dc_fe, pipeline_model = load_pipelines(version)
+    labels, survival_proba = predict_survival_batch(
+        grid_frame(axes), pipeline_dc_fe, pipeline_model)
+
+    block_sizes = len(axes["sexes"]) * (axes["age_max"] + 1) * axes["fare_count"]
+    table = dict(axes)
+    table["offsets"] = np.concatenate([[0], np.cumsum(block_sizes)[:-1]])
+    table["labels"] = labels.astype(np.int8)
+    table["survival_proba"] = survival_proba.astype(np.float32)
+    table["sources"] = pipeline_digests(version)
+
+    file_path = pipeline_path(version, PREDICTION_GRID_FILE)
+    joblib.dump(value=table, filename=file_path)
+    return file_path
+
+
+class PredictionGrid:
+    """
+    Array-backed table of every prediction reachable from the predictor
+    widgets. lookup returns None for inputs that are not on the grid.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.sex_index = {s: i for i, s in enumerate(table["sexes"])}
+        self.pclass_index = {c: i for i, c in enumerate(table["pclasses"])}
+        self.n_ages = table["age_max"] + 1
+
+    def lookup(self, sex, pclass, age, fare):
+        i_sex = self.sex_index.get(sex)
+        i_class = self.pclass_index.get(pclass)
+        if i_sex is None or i_class is None:
+            return None
+        if age != int(age) or not 0 <= age < self.n_ages:
+            return None
+
+        fare_step = fare - self.table["fare_min"][i_class]
+        i_fare = int(round(fare_step))
+        fare_steps = self.table["fare_steps"][i_class]
+        if abs(fare_step - i_fare) > 1e-9 or not 0 <= i_fare < fare_steps:
+            i_fare = self.extra_fare_index(i_class, fare)
+            if i_fare is None:
+                return None
+
+        fare_count = self.table["fare_count"][i_class]
+        index = (self.table["offsets"][i_class]
+                 + (i_sex * self.n_ages + int(age)) * fare_count + i_fare)
+        return int(self.table["labels"][index]), \
+            float(self.table["survival_proba"][index])
+
+    def extra_fare_index(self, i_class, fare):
+        fare_steps = self.table["fare_steps"][i_class]
+        for i_extra, extra in enumerate(self.table["fare_extra"][i_class]):
+            if abs(fare - extra) <= 1e-9:
+                return fare_steps + i_extra
+        return None
+
+
+def load_prediction_grid(version="v6"):
+    """
+    The version's prediction grid, or None when it has not been built or
+    was scored by pipelines that have since been replaced, in which case
+    callers fall back to the live pipelines.
+    """
+    try:
+        table = registry.load(pipeline_path(version, PREDICTION_GRID_FILE))
+    except FileNotFoundError:
+        return None
+    if table.get("sources") != pipeline_digests(version):
+        return None
+    return PredictionGrid(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Precompute predictions for every predictor page input.")
+    parser.add_argument("--version", default="v6")
+    args = parser.parse_args(argv)
+
+    file_path = build_prediction_grid(args.version, load_passenger_stats())
+    print(f"* Prediction grid written to {file_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,36 @@
 import streamlit as st
+from src.machine_learning.batch_prediction import predict_survival_batch
 
 
-def predict_survival(X_live, pipeline_dc_fe, pipeline_model):
-    X_live_survival_dc_fe = pipeline_dc_fe.transform(X_live)
-    survival_prediction = pipeline_model.predict(X_live_survival_dc_fe)
-    survival_prediction_proba = pipeline_model.predict_proba(
-        X_live_survival_dc_fe)
+def lookup_survival(X_live, prediction_grid):
+    row = X_live.iloc[0]
+    prediction = prediction_grid.lookup(
+        row["Sex"], row["Pclass"], row["Age"], row["Fare"])
+    if prediction is None:
+        return None
+    label, survival_proba = prediction
+    return [label], [survival_proba]
 
-    survival_prob = survival_prediction_proba[0, survival_prediction][0] * 100
-    if survival_prediction == 1:
+
+def predict_survival(X_live, pipeline_dc_fe, pipeline_model,
+                     prediction_grid=None):
+    prediction = None
+    if prediction_grid is not None:
+        prediction = lookup_survival(X_live, prediction_grid)
+    if prediction is None:
+        prediction = predict_survival_batch(
+            X_live, pipeline_dc_fe, pipeline_model)
+    survival_prediction, survival_proba = prediction
+
+    if survival_prediction[0] == 1:
+        survival_prob = survival_proba[0] * 100
         survival_result = 'would have'
     else:
+        survival_prob = (1 - survival_proba[0]) * 100
         survival_result = 'would not have'
 
     statement = (
-        f'### There is {survival_prob.round(1)}% probability '
+        f'### There is {round(survival_prob, 1)}% probability '
         f'that this passenger **{survival_result} survived**.')
 
     st.write(statement)
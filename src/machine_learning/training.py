@@ -0,0 +1,476 @@
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from feature_engine.encoding import OneHotEncoder
+from feature_engine.imputation import MeanMedianImputer
+from imblearn.over_sampling import SMOTE
+from sklearn.base import clone
+from sklearn.ensemble import (
+    AdaBoostClassifier, ExtraTreesClassifier, GradientBoostingClassifier,
+    RandomForestClassifier)
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, make_scorer
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import (
+    GridSearchCV, HalvingGridSearchCV, ParameterGrid, ParameterSampler,
+    train_test_split)
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from threadpoolctl import threadpool_limits
+from xgboost import XGBClassifier
+
+from src.data_management import PASSENGER_DATA_PATH, PASSENGER_SCHEMA
+from src.model_registry import PIPELINE_DIR
+from src.storage import read_dataset, write_dataset
+
+
+# the features the v6 pipelines were trained on, chosen in notebook 05
+BEST_FEATURES = ['Sex', 'Fare', 'Age', 'Pclass']
+
+
+# code copied from "Modelling and Evaluation" notebook
+def pipeline_dc_fe():
+    pipeline_base = Pipeline([
+        ('median', MeanMedianImputer(variables=['Age'],
+                                     imputation_method='median')),
+        ('categorical_encoder', OneHotEncoder(variables=['Sex'],
+                                              drop_last=False)),
+    ])
+    return pipeline_base
+
+
+# code copied from "Modelling and Evaluation" notebook; memory, a
+# joblib.Memory, caches the fitted scaler across folds and grid points
+def pipeline_clf(model, memory=None):
+    pipeline_base = Pipeline([
+        ("scaler", StandardScaler()),
+        ("model", model),
+    ], memory=memory)
+    return pipeline_base
+
+
+# on-disk memo of fitted preprocessing, keyed by input data and step params
+TRAINING_CACHE_DIR = os.environ.get("TRAINING_CACHE_DIR", ".cache/training")
+TRAINING_CACHE_BYTES = 512 * 2**20
+
+
+def training_memory(location=TRAINING_CACHE_DIR):
+    return joblib.Memory(location, verbose=0) if location else None
+
+
+def model_families():
+    return {
+        "LogisticRegression": LogisticRegression(random_state=0),
+        "XGBClassifier": XGBClassifier(random_state=0),
+        "DecisionTreeClassifier": DecisionTreeClassifier(random_state=0),
+        "RandomForestClassifier": RandomForestClassifier(random_state=0),
+        "GradientBoostingClassifier": GradientBoostingClassifier(random_state=0),
+        "ExtraTreesClassifier": ExtraTreesClassifier(random_state=0),
+        "AdaBoostClassifier": AdaBoostClassifier(random_state=0),
+    }
+
+
+# the notebook's two sweeps: every family at its defaults, then wider grids
+# for the three strongest families
+QUICK_PARAMS = {family: {} for family in model_families()}
+FULL_PARAMS = dict(QUICK_PARAMS, **{
+    "GradientBoostingClassifier": {
+        'model__learning_rate': [0.1, 0.01, 0.001],
+        'model__n_estimators': [100, 200, 300, 400],
+        'model__subsample': [1.0, 0.8, 0.6],
+        'model__max_depth': [None, 1, 3, 5],
+        'model__min_samples_split': [2, 5, 10],
+        'model__min_samples_leaf': [1, 2, 4],
+    },
+    "ExtraTreesClassifier": {
+        'model__n_estimators': [100, 200, 300, 400, 500],
+        'model__criterion': ['gini', 'entropy'],
+        'model__max_depth': [None, 10, 20, 30, 40],
+        'model__min_samples_split': [2, 5, 10],
+        'model__min_samples_leaf': [1, 2, 4],
+        'model__max_features': [None, 'sqrt', 'log2'],
+    },
+    "RandomForestClassifier": {
+        'model__n_estimators': [100, 200, 300, 400, 500],
+        'model__criterion': ['gini', 'entropy'],
+        'model__max_depth': [None, 10, 20, 30, 40],
+        'model__min_samples_split': [2, 5, 10],
+        'model__min_samples_leaf': [1, 2, 4],
+        'model__max_features': [None, 'sqrt', 'log2'],
+    },
+})
+PARAM_GRIDS = {"quick": QUICK_PARAMS, "full": FULL_PARAMS}
+
+
+def split_jobs(n_jobs, fits):
+    """
+    Shares a budget of n_jobs cores between model families, given each
+    family's number of cross-validation fits (candidates x folds). A family
+    with at least n_jobs fits keeps every core busy on its own, so those
+    are searched one after another with all n_jobs; the smaller families
+    are searched concurrently, splitting the cores between them. Returns
+    (concurrent families, cores each, sequential families, cores each).
+    """
+    n_jobs = os.cpu_count() if n_jobs in [None, -1] else max(1, n_jobs)
+    small = [family for family, n_fits in fits.items() if n_fits < n_jobs]
+    large = [family for family, n_fits in fits.items() if n_fits >= n_jobs]
+    small_jobs = max(1, n_jobs // len(small)) if small else n_jobs
+    return small, small_jobs, large, n_jobs
+
+
+SEARCH_MODES = ["grid", "halving", "random"]
+
+
+class BudgetedRandomSearch:
+    """
+    Cross-validates a grid's candidates in random order, a batch at a time,
+    until every candidate has been tried or the deadline (a time.time()
+    value) passes. At least one batch always runs. Exposes the attributes
+    of a fitted GridSearchCV that score_summary and train() rely on.
+    """
+
+    def __init__(self, estimator, params, deadline=None, cv=5, n_jobs=1,
+                 verbose=0, scoring=None, refit=True, random_state=0):
+        self.estimator = estimator
+        self.params = params
+        self.deadline = deadline
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+        self.scoring = scoring
+        self.refit = refit
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        candidates = list(ParameterSampler(
+            self.params, n_iter=len(ParameterGrid(self.params)),
+            random_state=self.random_state))
+        batch_size = 2 * self.n_jobs
+        results = []
+        for start in range(0, len(candidates), batch_size):
+            if results and self.deadline is not None \
+                    and time.time() >= self.deadline:
+                break
+            batch = [{name: [value] for name, value in candidate.items()}
+                     for candidate in candidates[start:start + batch_size]]
+            gs = GridSearchCV(self.estimator, batch, cv=self.cv,
+                              n_jobs=self.n_jobs, verbose=self.verbose,
+                              scoring=self.scoring, refit=False)
+            gs.fit(X, y)
+            results.append(gs.cv_results_)
+
+        keys = ["params", "mean_test_score", "std_test_score",
+                "mean_fit_time"]
+        keys += [f"split{i}_test_score" for i in range(self.cv)]
+        self.cv_results_ = {key: np.concatenate(
+            [np.asarray(result[key], dtype=object if key == "params" else None)
+             for result in results]) for key in keys}
+        self.cv_results_["params"] = list(self.cv_results_["params"])
+        self.exhausted_ = len(self.cv_results_["params"]) == len(candidates)
+
+        self.best_index_ = int(np.argmax(self.cv_results_["mean_test_score"]))
+        self.best_params_ = self.cv_results_["params"][self.best_index_]
+        self.best_score_ = self.cv_results_["mean_test_score"][self.best_index_]
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(
+                **self.best_params_).fit(X, y)
+        return self
+
+
+def search_family(key, model, params, X, y, cv, n_jobs, verbose, scoring,
+                  refit, mode="grid", deadline=None, memory=None):
+    print(f"\nRunning {mode} search for {key} \n")
+    model_jobs = model.get_params().get("n_jobs", "missing")
+    if model_jobs != "missing":
+        # the search parallelises over fits; a threaded model inside each
+        # fit would oversubscribe the cores it was given
+        model.set_params(n_jobs=1)
+
+    if mode == "halving":
+        gs = HalvingGridSearchCV(pipeline_clf(model, memory), params, cv=cv,
+                                 n_jobs=n_jobs, verbose=verbose,
+                                 scoring=scoring, refit=refit, random_state=0)
+    elif mode == "random":
+        gs = BudgetedRandomSearch(pipeline_clf(model, memory), params,
+                                  deadline=deadline, cv=cv, n_jobs=n_jobs,
+                                  verbose=verbose, scoring=scoring,
+                                  refit=refit)
+    else:
+        gs = GridSearchCV(pipeline_clf(model, memory), params, cv=cv,
+                          n_jobs=n_jobs,
+                          verbose=verbose, scoring=scoring, refit=refit)
+
+    start = time.perf_counter()
+    with threadpool_limits(1):
+        gs.fit(X, y)
+    gs.search_seconds_ = time.perf_counter() - start
+    if model_jobs != "missing" and hasattr(gs, "best_estimator_"):
+        # the saved model should not keep the search's single-thread setting
+        gs.best_estimator_.set_params(model__n_jobs=model_jobs)
+    return gs
+
+
+# code adapted from "Modelling and Evaluation" notebook
+class HyperparameterOptimizationSearch:
+
+    def __init__(self, models, params, mode="grid", memory=None):
+        self.models = models
+        self.params = params
+        self.mode = mode
+        self.memory = memory
+        self.keys = models.keys()
+        self.grid_searches = {}
+
+    def fit(self, X, y, cv, n_jobs, verbose=1, scoring=None, refit=True,
+            budget=None):
+        """
+        Searches every model family: exhaustively with GridSearchCV, by
+        successive halving, or in random order until budget seconds of wall
+        clock have passed. n_jobs cores (-1 for all) are shared as
+        split_jobs plans: families too small to fill them are searched
+        concurrently, the rest one at a time with every core, each given a
+        share of the remaining budget in proportion to its fits.
+        """
+        fits = {key: len(ParameterGrid(self.params[key])) * cv
+                for key in self.keys}
+        small, small_jobs, large, large_jobs = split_jobs(n_jobs, fits)
+        end = None if budget is None else time.time() + budget
+
+        def args(key, search_jobs, deadline):
+            return (key, self.models[key], self.params[key], X, y, cv,
+                    search_jobs, verbose, scoring, refit, self.mode, deadline,
+                    self.memory)
+
+        searches = {}
+        small_args = [args(key, small_jobs, end) for key in small]
+        if len(small) > 1:
+            with ProcessPoolExecutor(max_workers=len(small)) as pool:
+                searches.update(zip(small, pool.map(search_family,
+                                                    *zip(*small_args))))
+        else:
+            searches.update(zip(small, [search_family(*arg)
+                                        for arg in small_args]))
+
+        for i, key in enumerate(large):
+            deadline = None
+            if end is not None:
+                share = fits[key] / sum(fits[k] for k in large[i:])
+                deadline = time.time() + max(0, end - time.time()) * share
+            searches[key] = search_family(*args(key, large_jobs, deadline))
+        self.grid_searches = {key: searches[key] for key in self.keys}
+
+    def score_summary(self, sort_by='mean_score'):
+        def row(key, scores, params):
+            d = {
+                'estimator': key,
+                'min_score': min(scores),
+                'max_score': max(scores),
+                'mean_score': np.mean(scores),
+                'std_score': np.std(scores),
+            }
+            return pd.Series({**params, **d})
+
+        rows = []
+        for k in self.grid_searches:
+            cv_results = self.grid_searches[k].cv_results_
+            rounds = np.arange(len(cv_results['params']))
+            if 'iter' in cv_results:
+                # successive halving: only the finalists were scored on the
+                # full training set
+                rounds = np.flatnonzero(
+                    cv_results['iter'] == np.max(cv_results['iter']))
+            params = [cv_results['params'][i] for i in rounds]
+            scores = []
+            for i in range(self.grid_searches[k].cv):
+                key = "split{}_test_score".format(i)
+                r = np.asarray(cv_results[key])[rounds]
+                scores.append(r.reshape(len(params), 1))
+
+            all_scores = np.hstack(scores)
+            for p, s in zip(params, all_scores):
+                rows.append((row(k, s, p)))
+
+        df = pd.concat(rows, axis=1).T.sort_values([sort_by], ascending=False)
+        columns = ['estimator', 'min_score',
+                   'mean_score', 'max_score', 'std_score']
+        columns = columns + [c for c in df.columns if c not in columns]
+        return df[columns], self.grid_searches
+
+    def compute_summary(self):
+        """
+        Best cross-validated score per family against the compute spent
+        finding it: candidates and fits evaluated, total fit time across
+        folds and the search's wall-clock time.
+        """
+        rows = []
+        for k, gs in self.grid_searches.items():
+            cv_results = gs.cv_results_
+            rows.append({
+                'estimator': k,
+                'best_score': gs.best_score_,
+                'candidates': len({str(p) for p in cv_results['params']}),
+                'fits': len(cv_results['params']) * gs.cv,
+                'fit_seconds': np.sum(cv_results['mean_fit_time']) * gs.cv,
+                'search_seconds': gs.search_seconds_,
+            })
+        return pd.DataFrame(rows).sort_values('best_score', ascending=False)
+
+
+def next_version():
+    versions = [int(match.group(1)) for match in
+                (re.fullmatch(r"v(\d+)", name)
+                 for name in os.listdir(PIPELINE_DIR))
+                if match]
+    return f"v{max(versions, default=0) + 1}"
+
+
+def split_train_test(df, features=BEST_FEATURES):
+    X_train, X_test, y_train, y_test = train_test_split(
+        df.drop(['Survived'], axis=1),
+        df['Survived'],
+        test_size=0.2,
+        random_state=0,
+    )
+    return (X_train.filter(features), X_test.filter(features),
+            y_train, y_test)
+
+
+def feature_importance(pipeline, features):
+    model = pipeline['model']
+    if hasattr(model, "feature_importances_"):
+        importance = model.feature_importances_
+    else:
+        importance = np.abs(model.coef_).ravel()
+    return (pd.DataFrame(data={'Feature': features, 'Importance': importance})
+            .sort_values(by='Importance', ascending=False))
+
+
+def save_version(version, pipeline_data_cleaning_feat_eng, pipeline, X_train,
+                 y_train, X_test, y_test, summary=None, compute_summary=None):
+    file_path = os.path.join(PIPELINE_DIR, version)
+    os.makedirs(name=file_path)
+
+    for name, df in [("X_train", X_train), ("y_train", y_train),
+                     ("X_test", X_test), ("y_test", y_test)]:
+        df = df.to_frame() if isinstance(df, pd.Series) else df
+        for fmt in ["csv", "parquet", "npy"]:
+            write_dataset(df, f"{file_path}/{name}.csv", fmt=fmt)
+
+    joblib.dump(value=pipeline_data_cleaning_feat_eng,
+                filename=f"{file_path}/pipeline_dc_fe.pkl")
+    joblib.dump(value=pipeline, filename=f"{file_path}/pipeline_clf.pkl")
+    if summary is not None:
+        summary.to_csv(f"{file_path}/score_summary.csv", index=False)
+    if compute_summary is not None:
+        compute_summary.to_csv(f"{file_path}/search_compute.csv",
+                               index=False)
+
+    df_feature_importance = feature_importance(pipeline, X_train.columns)
+    df_feature_importance.plot(kind='bar', x='Feature', y='Importance')
+    plt.savefig(f'{file_path}/features_importance.png', bbox_inches='tight')
+    plt.close()
+    return file_path
+
+
+def preprocess(pipeline, oversample, X_train, X_test, y_train):
+    # pipeline and oversample are passed in, unfitted, so their params are
+    # part of the cache key when this is memoised
+    pipeline = clone(pipeline)
+    X_train = pipeline.fit_transform(X_train)
+    X_test = pipeline.transform(X_test)
+    X_train, y_train = clone(oversample).fit_resample(X_train, y_train)
+    return pipeline, X_train, X_test, y_train
+
+
+def train(version=None, params=None, n_jobs=-1, cv=5, verbose=0,
+          mode="grid", budget=None, cache_dir=TRAINING_CACHE_DIR,
+          cache_bytes=TRAINING_CACHE_BYTES):
+    """
+    Reruns notebook 05 end to end: split the raw passenger data, fit
+    pipeline_dc_fe, oversample the minority class with SMOTE, search every
+    model family (see HyperparameterOptimizationSearch.fit for mode and
+    budget) and save the best pipeline as a new version. Preprocessing is
+    memoised in cache_dir, trimmed to cache_bytes afterwards; pass
+    cache_dir=None to disable it.
+    """
+    version = version or next_version()
+    params = params or QUICK_PARAMS
+    memory = training_memory(cache_dir)
+
+    df = read_dataset(PASSENGER_DATA_PATH, schema=PASSENGER_SCHEMA)
+    X_train, X_test, y_train, y_test = split_train_test(df)
+
+    oversample = SMOTE(sampling_strategy='minority', random_state=0)
+    preprocess_cached = memory.cache(preprocess) if memory else preprocess
+    pipeline_data_cleaning_feat_eng, X_train, X_test, y_train = \
+        preprocess_cached(pipeline_dc_fe(), oversample, X_train, X_test,
+                          y_train)
+
+    models = model_families()
+    search = HyperparameterOptimizationSearch(
+        models={family: models[family] for family in params}, params=params,
+        mode=mode, memory=memory)
+    search.fit(X_train, y_train, scoring=make_scorer(accuracy_score),
+               n_jobs=n_jobs, cv=cv, verbose=verbose, budget=budget)
+    summary, grid_search_pipelines = search.score_summary(sort_by='mean_score')
+    if memory:
+        memory.reduce_size(bytes_limit=cache_bytes)
+
+    best_model = summary.iloc[0, 0]
+    pipeline = grid_search_pipelines[best_model].best_estimator_
+    # the saved artifact must not write into this run's cache when refitted
+    pipeline.set_params(memory=None)
+    file_path = save_version(version, pipeline_data_cleaning_feat_eng,
+                             pipeline, X_train, y_train, X_test, y_test,
+                             summary, search.compute_summary())
+    return file_path, summary, search.compute_summary()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Train the survival pipelines and save them as a new "
+                    "version.")
+    parser.add_argument("--version", help="defaults to the next free vN")
+    parser.add_argument("--grid", choices=sorted(PARAM_GRIDS), default="quick")
+    parser.add_argument("--families", nargs="*", metavar="FAMILY",
+                        choices=sorted(QUICK_PARAMS),
+                        help="model families to search (default: all)")
+    parser.add_argument("--jobs", type=int, default=-1,
+                        help="cores shared by the whole search (-1 for all)")
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--search", choices=SEARCH_MODES, default="grid",
+                        help="exhaustive grid, successive halving, or grid "
+                             "candidates in random order within --budget")
+    parser.add_argument("--budget", type=float, metavar="SECONDS",
+                        help="wall-clock limit for --search random")
+    parser.add_argument("--cache-dir", default=TRAINING_CACHE_DIR,
+                        help="where fitted preprocessing is memoised")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    params = PARAM_GRIDS[args.grid]
+    if args.families:
+        params = {family: params[family] for family in args.families}
+
+    if args.budget is not None and args.search != "random":
+        parser.error("--budget only applies to --search random")
+
+    file_path, summary, compute_summary = train(
+        args.version, params, n_jobs=args.jobs, cv=args.cv, mode=args.search,
+        budget=args.budget,
+        cache_dir=None if args.no_cache else args.cache_dir)
+    print(summary.head(10).to_string(index=False))
+    print(compute_summary.to_string(index=False))
+    print(f"* Best pipeline ({summary.iloc[0, 0]}) written to {file_path}")
+
+
+if __name__ == "__main__":
+    main()
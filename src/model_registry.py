@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+import time
+from os.path import join
+
+import joblib
+
+
+PIPELINE_DIR = "outputs/ml_pipeline/predict-survivor"
+PIPELINE_FILES = ["pipeline_dc_fe.pkl", "pipeline_clf.pkl"]
+
+
+def pipeline_path(version, file_name):
+    return join(PIPELINE_DIR, version, file_name)
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of unpickled pipelines, shared by every Streamlit
+    session and page. A file is reloaded only when its mtime/size changes
+    and its content hash no longer matches the loaded copy.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self._counters = {"hits": 0, "misses": 0, "reloads": 0,
+                          "load_seconds": 0.0}
+
+    def load(self, file_path):
+        stat = os.stat(file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        obj = self._lookup(file_path, signature)
+        if obj is not None:
+            return obj
+
+        # hashing and unpickling only hold this file's lock, so lookups of
+        # other files are not stalled behind a slow load
+        with self._lock:
+            load_lock = self._load_locks.setdefault(file_path,
+                                                    threading.Lock())
+        with load_lock:
+            # another session may have loaded it while we waited
+            obj = self._lookup(file_path, signature)
+            if obj is not None:
+                return obj
+
+            with self._lock:
+                entry = self._entries.get(file_path)
+            digest = file_digest(file_path)
+            if entry is not None and entry["digest"] == digest:
+                # touched but unchanged, e.g. a fresh checkout on deploy
+                with self._lock:
+                    entry["signature"] = signature
+                    self._counters["hits"] += 1
+                return entry["object"]
+
+            start = time.perf_counter()
+            obj = joblib.load(filename=file_path)
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self._counters["misses"] += 1
+                if entry is not None:
+                    self._counters["reloads"] += 1
+                self._counters["load_seconds"] += elapsed
+                self._entries[file_path] = {
+                    "object": obj,
+                    "signature": signature,
+                    "digest": digest,
+                    "load_seconds": elapsed,
+                }
+            return obj
+
+    def _lookup(self, file_path, signature):
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry["signature"] == signature:
+                self._counters["hits"] += 1
+                return entry["object"]
+        return None
+
+    def digest(self, file_path):
+        """
+        Content hash of a file, taken from the loaded copy while the file
+        is unchanged so the check costs a stat.
+        """
+        stat = os.stat(file_path)
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None \
+                    and entry["signature"] == (stat.st_mtime_ns, stat.st_size):
+                return entry["digest"]
+        return file_digest(file_path)
+
+    def load_pipelines(self, version):
+        pipeline_dc_fe = self.load(pipeline_path(version, "pipeline_dc_fe.pkl"))
+        pipeline_model = self.load(pipeline_path(version, "pipeline_clf.pkl"))
+        return pipeline_dc_fe, pipeline_model
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = {
+                path: {"load_seconds": entry["load_seconds"],
+                       "digest": entry["digest"]}
+                for path, entry in self._entries.items()}
+        return stats
+
+
+registry = ModelRegistry()
+
+
+def load_pipelines(version="v6"):
+    return registry.load_pipelines(version)
+
+
+def pipeline_digests(version="v6"):
+    # recorded by artifacts derived from the pipelines, to detect when the
+    # pipelines they were built from have since been replaced
+    return {name: registry.digest(pipeline_path(version, name))
+            for name in PIPELINE_FILES}
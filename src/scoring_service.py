@@ -0,0 +1,202 @@
+import argparse
+import json
+import logging
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pandas as pd
+from src.model_registry import load_pipelines
+from src.machine_learning.batch_prediction import predict_survival_batch
+from src.machine_learning.instrumentation import (
+    load_instrumented_pipelines, step_metrics)
+from src.warmup import warm_up
+
+
+logger = logging.getLogger(__name__)
+
+# a kiosk batch is a few hundred passengers; anything near this is abuse
+MAX_BODY_BYTES = 2**20
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTPServer that hands each connection to a fixed-size worker pool,
+    so concurrent kiosks are served without spawning a thread per request.
+    """
+
+    def __init__(self, server_address, handler_class, workers, version,
+                 instrument=False):
+        super().__init__(server_address, handler_class)
+        self.version = version
+        self.instrument = instrument
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_worker, request, client_address)
+
+    def process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    # seconds a worker waits on a silent client before dropping it
+    timeout = 10
+
+    def do_GET(self):
+        if self.path == "/health":
+            # not ready until the warm-up has loaded and exercised the models
+            if warm_up.ready():
+                status, code = "ok", 200
+            elif warm_up.error is not None:
+                status, code = "failed", 500
+            else:
+                status, code = "warming", 503
+            self.send_json(code, {"status": status,
+                                  "version": self.server.version})
+        elif self.path == "/metrics":
+            self.send_text(200, step_metrics.to_prometheus())
+        elif self.path == "/metrics.json":
+            self.send_json(200, step_metrics.to_json())
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ("/predict", "/predict/batch"):
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_json(400, {"error": "Invalid Content-Length"})
+            return
+        if length > MAX_BODY_BYTES:
+            self.send_json(413, {"error": f"Request body is over "
+                                          f"{MAX_BODY_BYTES} bytes"})
+            return
+
+        try:
+            payload = json.loads(self.rfile.read(length) or b"null")
+        except socket.timeout:
+            logger.warning("Timed out reading a request body from %s",
+                           self.client_address[0])
+            self.close_connection = True
+            return
+        except ValueError:
+            self.send_json(400, {"error": "Request body must be valid JSON"})
+            return
+
+        if self.path == "/predict":
+            passengers = [payload] if isinstance(payload, dict) else None
+        elif isinstance(payload, dict):
+            passengers = payload.get("passengers")
+        else:
+            passengers = payload
+
+        if not isinstance(passengers, list) or not passengers \
+                or not all(isinstance(p, dict) for p in passengers):
+            self.send_json(400, {"error": "Expected a passenger object, or a "
+                                          "list of passenger objects"})
+            return
+
+        try:
+            labels, survival_proba = score_passengers(
+                passengers, self.server.version, self.server.instrument)
+        except (KeyError, ValueError, TypeError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        if self.path == "/predict":
+            self.send_json(200, {"prediction": int(labels[0]),
+                                 "survival_probability": float(survival_proba[0])})
+        else:
+            self.send_json(200, {"predictions": labels.tolist(),
+                                 "survival_probabilities": survival_proba.tolist()})
+
+    def send_json(self, status, body):
+        self.send_content(status, json.dumps(body).encode("utf-8"),
+                          "application/json")
+
+    def send_text(self, status, body):
+        # Prometheus text exposition format
+        self.send_content(status, body.encode("utf-8"),
+                          "text/plain; version=0.0.4")
+
+    def send_content(self, status, content, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+def check_categories(pipeline_dc_fe, X):
+    # an unseen category would be one-hot encoded as all zeros and scored
+    # silently, so reject it like any other invalid input
+    for _, step in pipeline_dc_fe.steps:
+        for variable, categories in getattr(step, "encoder_dict_", {}).items():
+            if variable not in X:
+                continue
+            unseen = set(X[variable].dropna()) - set(categories)
+            if unseen:
+                raise ValueError(f"Unknown {variable} {sorted(map(str, unseen))}"
+                                 f", expected one of {list(categories)}")
+
+
+def score_passengers(passengers, version, instrument=False):
+    if instrument:
+        pipeline_dc_fe, pipeline_model = load_instrumented_pipelines(version)
+    else:
+        pipeline_dc_fe, pipeline_model = load_pipelines(version)
+    X = pd.DataFrame(passengers)
+    check_categories(pipeline_dc_fe, X)
+    return predict_survival_batch(X, pipeline_dc_fe, pipeline_model)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve survival predictions over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int,
+                        default=int(os.environ.get("SCORING_PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--version", default="v6")
+    parser.add_argument("--instrument", action="store_true",
+                        default=bool(os.environ.get("SCORING_INSTRUMENT")),
+                        help="time every pipeline step, served on /metrics")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+
+    # load the models and run a dummy prediction while starting to listen;
+    # /health reports ready once that is done
+    warm_up.start([args.version], dashboard=False)
+
+    server = PooledHTTPServer((args.host, args.port), ScoringRequestHandler,
+                              workers=args.workers, version=args.version,
+                              instrument=args.instrument)
+    logger.info("Scoring service (%s) listening on %s:%s",
+                args.version, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
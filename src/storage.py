@@ -0,0 +1,250 @@
+import argparse
+import glob
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.model_registry import file_digest
+
+try:
+    import pyarrow  # noqa: F401
+    COLUMNAR_AVAILABLE = True
+except ImportError:
+    COLUMNAR_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+# columnar formats, in order of preference, tried before the CSV itself
+COLUMNAR_FORMATS = [".parquet", ".arrow"]
+# metadata key under which a copy records the CSV it was written from
+SOURCE_KEY = "source_csv"
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+# both memoised by file signature, so an unchanged file costs one stat
+_source_records = {}
+_recorded_sources = {}
+
+
+def source_record(csv_path):
+    # the size and content hash of a CSV, recorded in the copies made of it
+    signature = file_signature(csv_path)
+    if signature not in _source_records:
+        _source_records[signature] = {"size": signature[2],
+                                      "sha256": file_digest(csv_path)}
+    return _source_records[signature]
+
+
+def matrix_columns_path(path):
+    stem, _ = os.path.splitext(path)
+    return stem + ".columns.json"
+
+
+def read_matrix_sidecar(npy_path):
+    # {"columns": [...], "source_csv": {...}}, or a bare list of columns as
+    # written before copies recorded their source
+    with open(matrix_columns_path(npy_path)) as f:
+        sidecar = json.load(f)
+    if isinstance(sidecar, list):
+        return {"columns": sidecar}
+    return sidecar
+
+
+def read_recorded_source(copy_path):
+    if copy_path.endswith(".npy"):
+        return read_matrix_sidecar(copy_path).get(SOURCE_KEY)
+    if copy_path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        metadata = pq.read_schema(copy_path).metadata or {}
+    else:
+        import pyarrow as pa
+
+        with pa.memory_map(copy_path) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+    recorded = metadata.get(SOURCE_KEY.encode())
+    return json.loads(recorded) if recorded else None
+
+
+def recorded_source(copy_path):
+    # a matrix records its source in the sidecar, written alongside it
+    signature = file_signature(matrix_columns_path(copy_path)
+                               if copy_path.endswith(".npy") else copy_path)
+    if signature not in _recorded_sources:
+        _recorded_sources[signature] = read_recorded_source(copy_path)
+    return _recorded_sources[signature]
+
+
+_warned = set()
+
+
+def copy_is_current(copy_path, csv_path):
+    """
+    True when a copy was written from the CSV as it is now, or there is no
+    CSV to compare it with. A stale copy is logged once per file version.
+    """
+    if not os.path.exists(csv_path):
+        return True
+    recorded = recorded_source(copy_path)
+    size = os.stat(csv_path).st_size
+    # a size mismatch is enough, without hashing the CSV
+    if recorded is not None and recorded["size"] == size \
+            and recorded == source_record(csv_path):
+        return True
+
+    key = (file_signature(copy_path), file_signature(csv_path))
+    if key not in _warned:
+        _warned.add(key)
+        logger.warning("%s was not written from the current %s; reading the "
+                       "CSV until the copy is refreshed with python -m "
+                       "src.storage", copy_path, csv_path)
+    return False
+
+
+def has_matrix(csv_path):
+    stem, _ = os.path.splitext(csv_path)
+    return os.path.exists(stem + ".npy") \
+        and os.path.exists(matrix_columns_path(csv_path)) \
+        and copy_is_current(stem + ".npy", csv_path)
+
+
+def dataset_file(csv_path, matrix=False):
+    """
+    The file a dataset is actually read from: its .npy matrix (if asked
+    for), Parquet or Arrow IPC copy when one exists, else the CSV. Copies
+    are only used while they match the CSV they were written from, so
+    regenerating a CSV without refreshing its copies falls back to it.
+    """
+    stem, _ = os.path.splitext(csv_path)
+    if matrix and has_matrix(csv_path):
+        return stem + ".npy"
+    if COLUMNAR_AVAILABLE:
+        for extension in COLUMNAR_FORMATS:
+            if os.path.exists(stem + extension) \
+                    and copy_is_current(stem + extension, csv_path):
+                return stem + extension
+    return csv_path
+
+
+def read_dataset(csv_path, schema=None, columns=None):
+    path = dataset_file(csv_path)
+    if schema is not None and columns is not None:
+        schema = {col: dtype for col, dtype in schema.items() if col in columns}
+
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path, columns=columns)
+    elif path.endswith(".arrow"):
+        df = pd.read_feather(path, columns=columns)
+    else:
+        return pd.read_csv(path, usecols=columns, dtype=schema)
+
+    if schema:
+        # no-op unless the file was written with different types
+        df = df.astype(schema, copy=False)
+    return df
+
+
+def read_matrix(csv_path, mmap=True):
+    """
+    A frame over the dataset's contiguous .npy matrix, memory-mapped
+    read-only by default so every process shares the same pages. Returns
+    None when the dataset has no current matrix copy, including a .npy
+    without its column names.
+    """
+    if not has_matrix(csv_path):
+        return None
+
+    stem, _ = os.path.splitext(csv_path)
+    values = np.load(stem + ".npy", mmap_mode="r" if mmap else None)
+    columns = read_matrix_sidecar(stem + ".npy")["columns"]
+    return pd.DataFrame(values, columns=columns, copy=False)
+
+
+def write_matrix(df, csv_path):
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+        raise ValueError(f"{csv_path} has non-numeric columns")
+    stem, _ = os.path.splitext(csv_path)
+    sidecar = {"columns": df.columns.to_list()}
+    if os.path.exists(csv_path):
+        sidecar[SOURCE_KEY] = source_record(csv_path)
+    np.save(stem + ".npy", np.ascontiguousarray(df.to_numpy()))
+    with open(matrix_columns_path(csv_path), "w") as f:
+        json.dump(sidecar, f)
+    return stem + ".npy"
+
+
+def columnar_table(df, csv_path):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if not os.path.exists(csv_path):
+        return table
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_KEY.encode()] = json.dumps(source_record(csv_path))
+    return table.replace_schema_metadata(metadata)
+
+
+def write_dataset(df, csv_path, fmt="parquet", schema=None):
+    if schema:
+        df = df.astype(schema)
+    stem, _ = os.path.splitext(csv_path)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        path = stem + ".parquet"
+        pq.write_table(columnar_table(df, csv_path), path)
+    elif fmt == "arrow":
+        import pyarrow.feather as feather
+
+        path = stem + ".arrow"
+        feather.write_feather(columnar_table(df, csv_path), path)
+    elif fmt == "npy":
+        path = write_matrix(df, csv_path)
+    elif fmt == "csv":
+        path = stem + ".csv"
+        df.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Unknown dataset format '{fmt}'")
+    return path
+
+
+def convert_datasets(patterns, fmt="parquet", schemas=None):
+    schemas = schemas or {}
+    written = []
+    for pattern in patterns:
+        for csv_path in sorted(glob.glob(pattern)):
+            schema = schemas.get(os.path.basename(csv_path))
+            df = pd.read_csv(csv_path, dtype=schema)
+            written.append(write_dataset(df, csv_path, fmt=fmt, schema=schema))
+    return written
+
+
+def main(argv=None):
+    from src.data_management import DATASET_SCHEMAS
+
+    parser = argparse.ArgumentParser(
+        description="Write typed columnar copies of the CSV datasets in outputs/.")
+    parser.add_argument("patterns", nargs="*", default=[
+        "outputs/datasets/collection/*.csv",
+        "outputs/datasets/cleaned/*.csv",
+        "outputs/ml_pipeline/predict-survivor/v6/*.csv",
+    ])
+    parser.add_argument("--format", choices=["parquet", "arrow", "npy"],
+                        default="parquet")
+    args = parser.parse_args(argv)
+
+    for path in convert_datasets(args.patterns, fmt=args.format,
+                                 schemas=DATASET_SCHEMAS):
+        print(f"* {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from scipy.stats import chi2_contingency
+from src.data_management import dataset_fingerprint
+
+
+_analysis_cache = OrderedDict()
+_analysis_lock = threading.Lock()
+MAX_CACHED_ANALYSES = 64
+
+
+def contingency_analysis(df, factors, target="Survived"):
+    """
+    Contingency table of target against one or more categorical factors
+    (e.g. ["Sex"] or ["Sex", "Pclass"]), with the chi-squared test of
+    independence. Results are cached per dataset fingerprint and must be
+    treated as read-only.
+    """
+    factors = [factors] if isinstance(factors, str) else list(factors)
+    key = (dataset_fingerprint(df), tuple(factors), target)
+
+    with _analysis_lock:
+        if key in _analysis_cache:
+            _analysis_cache.move_to_end(key)
+            return _analysis_cache[key]
+
+    observed = pd.crosstab(df[target], [df[f] for f in factors])
+    chi2, p_value, dof, expected = chi2_contingency(observed)
+    analysis = {
+        "observed": observed,
+        "expected": pd.DataFrame(expected, index=observed.index,
+                                 columns=observed.columns),
+        "chi2": chi2,
+        "p_value": p_value,
+        "dof": dof,
+    }
+
+    with _analysis_lock:
+        _analysis_cache[key] = analysis
+        while len(_analysis_cache) > MAX_CACHED_ANALYSES:
+            _analysis_cache.popitem(last=False)
+    return analysis
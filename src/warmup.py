@@ -0,0 +1,148 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# comma-separated pipeline versions to preload, e.g. WARMUP_VERSIONS=v6,v7
+WARMUP_VERSIONS_ENV = "WARMUP_VERSIONS"
+DEFAULT_VERSIONS = ["v6"]
+LABEL_MAP = ["Did Not Survive", "Survived"]
+DUMMY_PASSENGER = {"Sex": "female", "Age": 28.0, "Pclass": 2, "Fare": 14.0}
+
+
+def configured_versions():
+    versions = os.environ.get(WARMUP_VERSIONS_ENV, "")
+    return [v.strip() for v in versions.split(",") if v.strip()] \
+        or list(DEFAULT_VERSIONS)
+
+
+def warm_pipelines(version):
+    import pandas as pd
+    from src.model_registry import load_pipelines
+    from src.machine_learning.batch_prediction import predict_survival_batch
+
+    pipeline_dc_fe, pipeline_model = load_pipelines(version)
+    # the first predict pays for sklearn's lazy set-up, not the first visitor
+    predict_survival_batch(pd.DataFrame([DUMMY_PASSENGER]), pipeline_dc_fe,
+                           pipeline_model)
+
+
+def warm_dashboard_data():
+    from src.data_management import load_passenger_data, load_passenger_stats
+
+    load_passenger_data(compact=True)
+    load_passenger_data()
+    load_passenger_stats()
+
+
+def warm_dashboard_version(version):
+    from src.machine_learning.evaluate_clf import load_evaluation
+    from src.machine_learning.prediction_grid import load_prediction_grid
+
+    prediction_grid = load_prediction_grid(version)
+    if prediction_grid is not None:
+        prediction_grid.lookup(
+            DUMMY_PASSENGER["Sex"], DUMMY_PASSENGER["Pclass"],
+            DUMMY_PASSENGER["Age"], DUMMY_PASSENGER["Fare"])
+    load_evaluation(version, LABEL_MAP)
+
+
+def warm_up_steps(versions, dashboard):
+    steps = []
+    if dashboard:
+        steps.append(("passenger_data", warm_dashboard_data))
+    for version in versions:
+        steps.append((f"pipelines.{version}",
+                      lambda version=version: warm_pipelines(version)))
+        if dashboard:
+            steps.append((f"dashboard.{version}",
+                          lambda version=version:
+                          warm_dashboard_version(version)))
+    return steps
+
+
+class WarmUp:
+    """
+    Preloads the pipelines, caches and statistics the app serves from, so
+    the first request after a restart does not pay for them. Readiness is
+    only reported once every step has finished without error.
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.report = {}
+        self.error = None
+
+    def run(self, versions=None, dashboard=True):
+        versions = versions or configured_versions()
+        start = time.perf_counter()
+        try:
+            for name, step in warm_up_steps(versions, dashboard):
+                step_start = time.perf_counter()
+                step()
+                self.report[name] = time.perf_counter() - step_start
+                logger.info("Warm-up step %s took %.3f seconds", name,
+                            self.report[name])
+        except Exception as e:
+            self.error = e
+            logger.exception("Warm-up failed")
+        else:
+            logger.info("Warm-up of %s finished in %.3f seconds: ready",
+                        ", ".join(versions), time.perf_counter() - start)
+        finally:
+            self._done.set()
+        return self.report
+
+    def start(self, versions=None, dashboard=True):
+        """
+        Runs the warm-up in a background thread, once per process.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self.run, args=(versions, dashboard),
+                    name="warm-up", daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def ready(self):
+        return self._done.is_set() and self.error is None
+
+
+warm_up = WarmUp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Preload pipelines, caches and statistics and run a "
+                    "dummy prediction before the app takes traffic.")
+    parser.add_argument("--versions", nargs="*",
+                        help="pipeline versions to preload (default "
+                             f"${WARMUP_VERSIONS_ENV} or "
+                             f"{','.join(DEFAULT_VERSIONS)})")
+    parser.add_argument("--no-dashboard", action="store_true",
+                        help="skip the passenger data, prediction grid and "
+                             "evaluation the dashboard pages use")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    warm_up.run(args.versions, dashboard=not args.no_dashboard)
+    if not warm_up.ready():
+        return 1
+    print("* Ready")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())